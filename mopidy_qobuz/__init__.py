@@ -39,10 +39,29 @@ class Extension(ext.Extension):
         schema["search_track_count"] = config.Integer()
         schema["search_album_count"] = config.Integer()
         schema["custom_libraries"] = config.Path(optional=True)
+        schema["metadata_cache_size"] = config.Integer(minimum=0)
+        schema["prefetch_count"] = config.Integer(minimum=0)
+        schema["audio_cache_size"] = config.Integer(minimum=0)
+        schema["cover_proxy"] = config.Boolean()
+        schema["library_mirror"] = config.Boolean()
+        schema["search_remote"] = config.Boolean()
+        schema["artist_lookup_count"] = config.Integer(minimum=0)
+        schema["artist_lookup_order"] = config.String(
+            choices=["appearances", "releases"]
+        )
 
         return schema
 
+    def get_command(self):
+        from .commands import QobuzCommand
+
+        return QobuzCommand()
+
     def setup(self, registry):
         from .backend import QobuzBackend
+        from .covers import factory
+        from .frontend import QobuzFrontend
 
         registry.add("backend", QobuzBackend)
+        registry.add("frontend", QobuzFrontend)
+        registry.add("http:app", {"name": self.ext_name, "factory": factory})
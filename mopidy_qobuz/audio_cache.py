@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+import collections
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import pathlib
+import threading
+
+logger = logging.getLogger(__name__)
+
+_CHUNK_SIZE = 64 * 1024
+
+
+class AudioCache:
+    """On-disk cache of audio files with a size budget and LRU eviction.
+
+    Files are named <track ID>_<format ID>.<extension>, so a track is only
+    found if it was cached at the requested quality.
+    """
+
+    def __init__(self, path, max_size, session):
+        self.path = pathlib.Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self._session = session
+        self._files = collections.OrderedDict()
+        self._size = 0
+        self._pending = set()
+        self._lock = threading.Lock()
+        # One download at a time: filling the cache must not starve playback
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="qobuz-audio-cache"
+        )
+        self._scan()
+
+    def get(self, track_id, format_id):
+        "Return the path of the cached file, or None."
+        key = (str(track_id), int(format_id))
+        with self._lock:
+            try:
+                file, _ = self._files[key]
+            except KeyError:
+                return None
+
+            self._files.move_to_end(key)
+
+        try:
+            os.utime(file)
+        except FileNotFoundError:
+            logger.debug("%s was removed from the cache", file)
+            self._remove(key)
+            return None
+
+        return file
+
+    def fill(self, downloadable, format_id):
+        "Download the track in the background, unless it's already cached."
+        key = (str(downloadable.id), int(format_id))
+        with self._lock:
+            if key in self._files or key in self._pending:
+                return None
+
+            self._pending.add(key)
+
+        return self._executor.submit(self._download, key, downloadable)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    def _download(self, key, downloadable):
+        file = self.path / f"{key[0]}_{key[1]}.{downloadable.extension.lower()}"
+        part = file.with_suffix(".part")
+
+        try:
+            with self._session.get(downloadable.url, stream=True) as response:
+                response.raise_for_status()
+                with open(part, "wb") as f:
+                    for chunk in response.iter_content(_CHUNK_SIZE):
+                        f.write(chunk)
+
+            part.replace(file)
+        except Exception as error:
+            logger.warning("Couldn't cache %s: %s", downloadable, error)
+            part.unlink(missing_ok=True)
+            return None
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+        logger.debug("Cached %s in %s", downloadable, file)
+        self._add(key, file)
+        return file
+
+    def _add(self, key, file):
+        size = file.stat().st_size
+        with self._lock:
+            self._files[key] = (file, size)
+            self._size += size
+            evicted = []
+            while self._size > self.max_size and len(self._files) > 1:
+                _, (old_file, old_size) = self._files.popitem(last=False)
+                self._size -= old_size
+                evicted.append(old_file)
+
+        for old_file in evicted:
+            logger.debug("Evicting %s from the audio cache", old_file)
+            old_file.unlink(missing_ok=True)
+
+    def _remove(self, key):
+        with self._lock:
+            _, size = self._files.pop(key, (None, 0))
+            self._size -= size
+
+    def _scan(self):
+        files = []
+        for file in self.path.iterdir():
+            if file.suffix == ".part":
+                file.unlink(missing_ok=True)
+                continue
+
+            try:
+                track_id, format_id = file.stem.rsplit("_", 1)
+                key = (track_id, int(format_id))
+            except ValueError:
+                logger.debug("Ignoring unknown file: %s", file)
+                continue
+
+            stat = file.stat()
+            files.append((stat.st_mtime, key, file, stat.st_size))
+
+        # Least recently played first
+        for _, key, file, size in sorted(files):
+            self._files[key] = (file, size)
+            self._size += size
+
+        logger.info("Audio cache: %d files, %d bytes", len(self._files), self._size)
@@ -1,17 +1,28 @@
 # -*- coding: utf-8 -*-
 
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import sys
 
 from mopidy import backend
 import pykka
 
+from mopidy_qobuz import audio_cache
 from mopidy_qobuz import client as qclient
+from mopidy_qobuz import Extension
+from mopidy_qobuz import images
 from mopidy_qobuz import library
 from mopidy_qobuz import playback
 from mopidy_qobuz import playlists
+from mopidy_qobuz import search_index
 
 logger = logging.getLogger(__name__)
 
+_IO_WORKERS = 8
+_PLAYBACK_WORKERS = 2
+# Pages of a listing fetched at once
+_PAGE_WORKERS = 4
+
 
 class QobuzBackend(pykka.ThreadingActor, backend.Backend):
     def __init__(self, config, audio):
@@ -19,6 +30,18 @@ class QobuzBackend(pykka.ThreadingActor, backend.Backend):
         self._config = config
         self._audio = audio
         self._client = None
+        self._audio_cache = None
+        self._image_index = None
+        self._search_index = None
+        # Metadata requests fanned out by the providers (lookup, search...)
+        self._executor = ThreadPoolExecutor(
+            max_workers=_IO_WORKERS, thread_name_prefix="qobuz-io"
+        )
+        # Playback URLs are resolved in their own lane, so they never queue
+        # behind browse or lookup requests.
+        self._playback_executor = ThreadPoolExecutor(
+            max_workers=_PLAYBACK_WORKERS, thread_name_prefix="qobuz-playback"
+        )
         self.playlists = playlists.QobuzPlaylistsProvider(self)
         self.library = library.QobuzLibraryProvider(self)
         self.playback = playback.QobuzPlaybackProvider(audio, self)
@@ -30,9 +53,33 @@ class QobuzBackend(pykka.ThreadingActor, backend.Backend):
     def on_start(self):
         logger.info("Starting Qobuz client")
         config = self._config["qobuz"]
-        self._client = qclient.Client(config["app_id"], config["secret"])
+        self._client = qclient.Client(
+            config["app_id"],
+            config["secret"],
+            cache=_get_cache(self._config),
+            # Nested listings fan out again from the I/O workers
+            pool_size=_IO_WORKERS + _PLAYBACK_WORKERS + _PAGE_WORKERS,
+            max_workers=_PAGE_WORKERS,
+        )
+
+        self._image_index = images.ImageIndex(
+            Extension.get_cache_dir(self._config) / "images.sqlite3"
+        )
+        self._client.entities.subscribe(self._image_index.observe)
+        self._client.entities.subscribe_raw(self._image_index.observe_raw)
+        self._search_index = search_index.SearchIndex(
+            Extension.get_cache_dir(self._config) / "search.sqlite3"
+        )
+        self._client.entities.subscribe(self._search_index.observe)
+        self._client.entities.subscribe_raw(self._search_index.observe_raw)
 
         self._client.login(config["username"], config["password"])
+        self._client.mirror = _get_mirror(self._config)
+        if self._client.mirror is not None:
+            # Served from the disk until the sync finishes
+            self._executor.submit(self._sync_mirror)
+
+        self._audio_cache = _get_audio_cache(self._config, self._client)
 
         logger.info(
             "Set quality: %s [%s membership]",
@@ -42,4 +89,66 @@ class QobuzBackend(pykka.ThreadingActor, backend.Backend):
 
     def on_stop(self):
         # TODO: implement logout
-        pass
+        self.playback.close()
+        # The jobs use the stores closed below: they must be done first
+        _shutdown(self._executor)
+        _shutdown(self._playback_executor)
+
+        if self._client is not None and self._client.cache is not None:
+            self._client.cache.close()
+
+        if self._audio_cache is not None:
+            self._audio_cache.close()
+
+        if self._image_index is not None:
+            self._image_index.close()
+
+        if self._search_index is not None:
+            self._search_index.close()
+
+        if self._client is not None and self._client.mirror is not None:
+            self._client.mirror.close()
+
+    def _sync_mirror(self):
+        try:
+            self._client.mirror.sync(self._client)
+        except Exception as error:
+            logger.warning("%s raised syncing the library: %s", type(error), error)
+
+
+def _shutdown(executor):
+    "Wait for the running jobs; the queued ones are cancelled (Python 3.9+)"
+    if sys.version_info >= (3, 9):
+        executor.shutdown(wait=True, cancel_futures=True)
+    else:
+        executor.shutdown(wait=True)
+
+
+def _get_cache(config):
+    size = config["qobuz"]["metadata_cache_size"]
+    if not size:
+        logger.info("Metadata cache disabled")
+        return None
+
+    path = Extension.get_cache_dir(config) / "metadata.sqlite3"
+    logger.info("Metadata cache: %s (%d MB)", path, size)
+    return qclient.SQLiteCache(path, max_size=size * 1024 * 1024)
+
+
+def _get_mirror(config):
+    if not config["qobuz"]["library_mirror"]:
+        return None
+
+    path = Extension.get_cache_dir(config) / "library.sqlite3"
+    logger.info("Library mirror: %s", path)
+    return qclient.LibraryMirror(path)
+
+
+def _get_audio_cache(config, client):
+    size = config["qobuz"]["audio_cache_size"]
+    if not size:
+        return None
+
+    path = Extension.get_cache_dir(config) / "audio"
+    logger.info("Audio cache: %s (%d MB)", path, size)
+    return audio_cache.AudioCache(path, size * 1024 * 1024, client.cdn)
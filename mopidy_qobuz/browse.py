@@ -1,8 +1,14 @@
 # -*- coding: utf-8 -*-
 
+import collections
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import json
 import logging
 import os
 import re
+import threading
+import time
 
 from mopidy import models
 import yaml
@@ -94,7 +100,7 @@ def _get_callable(uri):
         return val
 
 
-def browse(uri, client, config={}):
+def browse(uri, client, config={}, cache=None):
     try:
         return _STATIC[uri]
     except KeyError:
@@ -103,11 +109,99 @@ def browse(uri, client, config={}):
     callable_ = _get_callable(uri)
 
     if callable_:
+        if cache is not None:
+            return cache.get(
+                uri, lambda: callable_(uri=uri, client=client, config=config)
+            )
+
         return callable_(uri=uri, client=client, config=config)
 
     logger.info("Can't process uri format: %s", uri)
 
 
+class BrowseCache:
+    """Cache of the Ref lists returned by the browse callables.
+
+    Each URI prefix in _BROWSE_TTLS has a (ttl, max_age) pair in seconds.
+    Entries older than ttl are still served, while a refresh runs in the
+    executor (stale-while-revalidate); entries older than max_age are
+    reloaded before returning. Other URIs aren't cached.
+    """
+
+    def __init__(self, executor, max_items=512):
+        self.max_items = max_items
+        self._executor = executor
+        self._items = collections.OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get(self, uri, load):
+        ttls = _get_ttls(uri)
+        if ttls is None:
+            return load()
+
+        ttl, max_age = ttls
+        with self._lock:
+            fetched, refs = self._items.get(uri, (None, None))
+            if fetched is not None:
+                self._items.move_to_end(uri)
+
+        age = None if fetched is None else time.monotonic() - fetched
+        if age is None or age > max_age:
+            return self._load(uri, load)
+
+        if age > ttl:
+            self._revalidate(uri, load)
+
+        return refs
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def _revalidate(self, uri, load):
+        with self._lock:
+            if uri in self._refreshing:
+                return
+            self._refreshing.add(uri)
+
+        logger.debug("Refreshing stale directory: %s", uri)
+        try:
+            self._executor.submit(self._refresh, uri, load)
+        except RuntimeError:  # Shutting down
+            with self._lock:
+                self._refreshing.discard(uri)
+
+    def _refresh(self, uri, load):
+        try:
+            self._load(uri, load)
+        except Exception as error:
+            logger.warning("%s raised refreshing %s: %s", type(error), uri, error)
+        finally:
+            with self._lock:
+                self._refreshing.discard(uri)
+
+    def _load(self, uri, load):
+        refs = load()
+        # Failed or empty listings are retried next time
+        if refs:
+            with self._lock:
+                self._items[uri] = (time.monotonic(), refs)
+                self._items.move_to_end(uri)
+                while len(self._items) > self.max_items:
+                    self._items.popitem(last=False)
+
+        return refs
+
+
+def _get_ttls(uri):
+    for prefix, ttls in _BROWSE_TTLS:
+        if uri.startswith(prefix):
+            return ttls
+
+    return None
+
+
 def _featured_album_tags():
     return [
         models.Ref.directory(uri=f"qobuz:featured:albums:tags:{key}", name=val)
@@ -131,31 +225,27 @@ def _tag_contents(uri="qobuz:featured:playlists"):
 
 def _favorite_contents(*, uri, client, config):
     user = User(client)
-    to_return = []
 
     if uri.startswith("qobuz:favorites:albums"):
-        to_return = [
-            translators.to_album_ref(album) for album in user.get_favorites(limit=50)
-        ]
+        get_page = functools.partial(user.get_favorites_page, "albums")
+        return _browse_pages(uri, get_page, translators.to_album_ref)
     if uri.startswith("qobuz:favorites:artists"):
-        to_return = [
-            translators.to_artist_ref(artist)
-            for artist in user.get_favorites_artists(limit=500)
-        ]
+        get_page = functools.partial(user.get_favorites_page, "artists")
+        return _browse_pages(uri, get_page, translators.to_artist_ref)
     elif uri.startswith("qobuz:favorites:playlists"):
-        to_return = [
-            translators.to_playlist_ref(playlist)
-            for playlist in user.get_playlists(limit=50)
-        ]
+        return _browse_pages(uri, user.get_playlists_page, translators.to_playlist_ref)
 
-    return _filter_none(to_return)
+    return []
 
 
 def _browse_playlist(*, uri: str, client, config):
-    playlist_id = uri.split(":")[-1]
-    playlist = Playlist.from_id(client, playlist_id)
-    tracks = [translators.to_track_ref(track, False) for track in playlist.tracks]
-    return _filter_none(tracks)
+    playlist_id = _split_page(uri)[0].split(":")[-1]
+    playlist = Playlist.from_data(client, {"id": playlist_id})
+    return _browse_pages(
+        uri,
+        playlist.get_tracks_page,
+        functools.partial(translators.to_track_ref, hires_required=False),
+    )
 
 
 def _browse_album(*, uri: str, client, config):
@@ -166,10 +256,43 @@ def _browse_album(*, uri: str, client, config):
 
 
 def _browse_artist(*, uri: str, client, config):
-    artist_id = uri.split(":")[-1]
-    artist = Artist.from_id(client, artist_id)
-    albums = [translators.to_album_ref(album, False) for album in artist.albums]
-    return _filter_none(albums)
+    artist_id = _split_page(uri)[0].split(":")[-1]
+    artist = Artist.from_data(client, {"id": artist_id})
+    return _browse_pages(uri, artist.get_albums_page, translators.to_album_ref)
+
+
+def _browse_pages(uri, get_page, to_ref):
+    """Browse a listing one page at a time.
+
+    Listings bigger than a page are shown as virtual directories, one per
+    page (<uri>:page:<number>), each fetched when opened.
+    """
+    base_uri, number = _split_page(uri)
+    page = get_page(
+        offset=((number or 1) - 1) * _BROWSE_PAGE_SIZE, limit=_BROWSE_PAGE_SIZE
+    )
+
+    if number is None and page.total > _BROWSE_PAGE_SIZE:
+        offsets = range(0, page.total, _BROWSE_PAGE_SIZE)
+        return [
+            models.Ref.directory(
+                uri=f"{base_uri}:page:{number}",
+                name=f"Page {number} ({offset + 1}-"
+                f"{min(offset + _BROWSE_PAGE_SIZE, page.total)})",
+            )
+            for number, offset in enumerate(offsets, 1)
+        ]
+
+    return _filter_none([to_ref(item) for item in page.items])
+
+
+def _split_page(uri):
+    "Return the URI of the listing and the page number (or None)"
+    match = _PAGE_RE.search(uri)
+    if match is None:
+        return uri, None
+
+    return uri[: match.start()], int(match.group(1))
 
 
 def _browse_focus(*, uri: str, client, config):
@@ -241,7 +364,10 @@ def _browse_custom_sub(*, uri: str, client, config: dict):
 
 _uris_map = {
     "album": (translators.to_album_ref, Album.from_id),
-    "track": (translators.to_track_ref, Track.from_id),
+    "track": (
+        functools.partial(translators.to_track_ref, hires_required=False),
+        Track.from_id,
+    ),
     "playlist": (translators.to_playlist_ref, Playlist.from_id),
 }
 
@@ -249,23 +375,53 @@ _uris_map = {
 def _browse_custom_sub_items(*, uri: str, client, config: dict):
     parent = uri.split(":")[-2]
     id_ = uri.split(":")[-1]
-    refs_ = []
     items = _get_yaml_items(config)[parent][id_]
 
-    for uri_ in items:
-        type_, id_ = uri_.strip().split(":")[-2:]
-        try:
-            translator_, client_method = _uris_map[type_]
-        except KeyError:
-            logger.warning("%s URI not supported", uri_)
-            continue
+    return _resolve_custom_items(client, items)
 
-        try:
-            refs_.append(translator_(client_method(client, id_)))
-        except Exception as error:
-            logger.warning(error)
 
-    return refs_
+def _resolve_custom_items(client, uris):
+    "Resolve the Refs of the items concurrently, in their original order"
+    uris = [uri.strip() for uri in uris]
+    if not uris:
+        return []
+
+    workers = min(client.max_workers, len(uris))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        refs = executor.map(functools.partial(_get_custom_ref, client), uris)
+        return _filter_none(refs)
+
+
+def _get_custom_ref(client, uri):
+    """Resolve the Ref of a custom library item.
+
+    Refs are kept in the client's (persistent) cache, so that items don't
+    have to be fetched again on every browse.
+    """
+    type_, id_ = uri.split(":")[-2:]
+    try:
+        translator, client_method = _uris_map[type_]
+    except KeyError:
+        logger.warning("%s URI not supported", uri)
+        return None
+
+    key = f"ref:{uri}"
+    if client.cache is not None:
+        value = client.cache.get(key)
+        if value is not None:
+            return json.loads(value, object_hook=models.model_json_decoder)
+
+    try:
+        ref = translator(client_method(client, id_))
+    except Exception as error:
+        logger.warning(error)
+        return None
+
+    if ref is not None and client.cache is not None:
+        value = json.dumps(ref, cls=models.ModelJSONEncoder).encode()
+        client.cache.set(key, value, _CUSTOM_REF_TTL)
+
+    return ref
 
 
 def _get_yaml_items(config):
@@ -278,7 +434,43 @@ def _get_yaml_items(config):
         logger.warning("custom_libraries (%s) doesn't exist", folder_path)
         return {}
 
-    return _read_yaml_folder(folder_path)
+    with _yaml_indexes_lock:
+        index = _yaml_indexes.setdefault(folder_path, _YamlIndex(folder_path))
+
+    return index.items()
+
+
+class _YamlIndex:
+    """Parsed custom libraries of a folder.
+
+    The files are only parsed again when the folder's listing, or the
+    modification time or size of a file, changes.
+    """
+
+    def __init__(self, folder_path):
+        self.folder_path = folder_path
+        self._snapshot = None
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def items(self):
+        snapshot = _yaml_snapshot(self.folder_path)
+        with self._lock:
+            if snapshot != self._snapshot:
+                logger.debug("Reading custom libraries in %s", self.folder_path)
+                self._items = _read_yaml_folder(self.folder_path)
+                self._snapshot = snapshot
+
+            return self._items
+
+
+def _yaml_snapshot(folder_path):
+    with os.scandir(folder_path) as entries:
+        return sorted(
+            (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+            for entry in entries
+            if entry.name.endswith((".yaml", ".yml"))
+        )
 
 
 def _read_yaml_folder(folder_path):
@@ -303,6 +495,27 @@ def _filter_none(items):
     return [item for item in items if item is not None]
 
 
+_BROWSE_PAGE_SIZE = 100
+_PAGE_RE = re.compile(r":page:(\d+)$")
+
+_HOUR = 60 * 60
+
+_CUSTOM_REF_TTL = 30 * 24 * _HOUR
+
+_yaml_indexes = {}
+_yaml_indexes_lock = threading.Lock()
+
+# (ttl, max_age) of the browse cache, by URI prefix. Featured listings
+# change a few times a day at most; favorites are edited by the user.
+_BROWSE_TTLS = (
+    ("qobuz:featured:", (6 * _HOUR, 7 * 24 * _HOUR)),
+    ("qobuz:focus:", (6 * _HOUR, 7 * 24 * _HOUR)),
+    ("qobuz:album:", (24 * _HOUR, 7 * 24 * _HOUR)),
+    ("qobuz:artist", (6 * _HOUR, 7 * 24 * _HOUR)),
+    ("qobuz:playlist:", (5 * 60, 24 * _HOUR)),
+    ("qobuz:favorites:", (60, 24 * _HOUR)),
+)
+
 _STATIC = {
     "qobuz:directory": [_FAVORITES, _FEATURED, _CUSTOM_DIRS],
     "qobuz:favorites": [_FAVORITE_ALBUMS, _FAVORITE_ARTISTS, _FAVORITE_PLAYLISTS],
@@ -2,15 +2,29 @@
 # Author : Vitiko <vhnz98@gmail.com>
 # -*- coding: utf-8 -*-
 
+import collections
+from concurrent.futures import ThreadPoolExecutor
 import datetime
 import hashlib
 import json
 import logging
+import queue
+import threading
 import time
 import urllib.parse
+import weakref
 
 import requests
 
+from mopidy_qobuz.client import jsonstream
+from mopidy_qobuz.client.cache import Cache
+from mopidy_qobuz.client.cache import MemoryCache  # noqa: F401
+from mopidy_qobuz.client.cache import SQLiteCache  # noqa: F401
+from mopidy_qobuz.client.cache import TTLCache  # noqa: F401
+from mopidy_qobuz.client.mirror import LibraryMirror  # noqa: F401
+from mopidy_qobuz.client.transport import CircuitOpenError  # noqa: F401
+from mopidy_qobuz.client.transport import Transport
+
 
 class QobuzException(Exception):
     pass
@@ -48,22 +62,69 @@ class InvalidQuality(QobuzException):
     pass
 
 
+class ServiceUnavailableError(QobuzException):
+    pass
+
+
 logger = logging.getLogger(__name__)
 
 BASE_URL = "https://www.qobuz.com/api.json/0.2"
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/95.0.4638.69 Safari/537.36."
 
+_HOUR = 60 * 60
+_DAY = 24 * _HOUR
+
+# Seconds a successful GET response is kept in the cache. Endpoints not listed
+# here (user data, file URLs, login) are never cached.
+CACHE_TTLS = {
+    "album/get": 7 * _DAY,
+    "track/get": 7 * _DAY,
+    "artist/get": _DAY,
+    "label/get": _DAY,
+    "focus/get": _DAY,
+    "playlist/get": _HOUR,
+    "focus/list": 6 * _HOUR,
+    "album/getFeatured": 6 * _HOUR,
+    "playlist/getFeatured": 6 * _HOUR,
+    "album/search": _HOUR,
+    "artist/search": _HOUR,
+    "track/search": _HOUR,
+}
+
 
 class Client:
-    def __init__(self, app_id=None, secret=None, user_agent=None, session=None):
+    def __init__(
+        self,
+        app_id=None,
+        secret=None,
+        user_agent=None,
+        session=None,
+        cache: Cache = None,
+        cache_ttls=None,
+        max_workers=4,
+        pool_size=10,
+    ):
+        "Timeouts, retries and the circuit breaker are set by transport.Transport"
         self.secret = str(secret)
         self.app_id = str(app_id)
-        self._session = session or requests.Session()
+        self.transport = Transport(session, pool_size=pool_size)
+        self._session = self.transport.session
         self._session.headers.update(
             {"User-Agent": user_agent or USER_AGENT, "X-App-Id": self.app_id}
         )
+        # Audio files are served by a CDN: its failures don't tell whether
+        # the API is down, so it has its own session, without a breaker
+        self.cdn = Transport(pool_size=pool_size, failure_threshold=None)
+        self.cdn.session.headers["User-Agent"] = user_agent or USER_AGENT
         self._label = None
         self._logged_in = False
+        self.cache = cache
+        self.cache_ttls = CACHE_TTLS if cache_ttls is None else cache_ttls
+        self.entities = IdentityMap()
+        # Local copy of the user's library (see mirror.LibraryMirror)
+        self.mirror = None
+        # Concurrent requests allowed when fetching the pages of a listing
+        self.max_workers = max_workers
 
     def login(self, email: str, password: str, force=False):
         if not self._logged_in or force:
@@ -77,7 +138,7 @@ class Client:
             "password": pwd,
             "app_id": self.app_id,
         }
-        response = self._session.get(f"{BASE_URL}/user/login", params=params)
+        response = self.transport.get(f"{BASE_URL}/user/login", params=params)
 
         if response.status_code == 401:
             raise AuthenticationError(_get_message(response))
@@ -100,14 +161,62 @@ class Client:
 
         logger.info("Logged: OK // Qobuz membership: %s", self._label)
 
-    def get(self, endpoint: str, params: dict, raise_for_status=True):
+    def get(self, endpoint: str, params: dict, raise_for_status=True, refresh=False):
+        """
+        :param refresh: skip the cached response (the new one is cached)
+        """
+        ttl = self.cache_ttls.get(endpoint) if self.cache is not None else None
+        if ttl and not refresh:
+            key = _cache_key(endpoint, params)
+            content = self.cache.get(key)
+            if content is not None:
+                logger.debug("Cache hit: %s", key)
+                return _cached_response(endpoint, content)
+
         logger.debug("Making a call: %s - %s", endpoint, params)
-        response = self._session.get(f"{BASE_URL}/{endpoint}", params=params)
+        response = self.transport.get(f"{BASE_URL}/{endpoint}", params=params)
+
+        if ttl and response.status_code == 200:
+            self.cache.set(_cache_key(endpoint, params), response.content, ttl)
+
         return _handle_response(response, raise_for_status)
 
+    def stream(self, endpoint: str, params: dict):
+        """
+        Make the call, and return an iterator of the chunks of the response
+        body, read as they are consumed. Cached like get(), once read.
+
+        raises QobuzException subclasses like get()
+        """
+        ttl = self.cache_ttls.get(endpoint) if self.cache is not None else None
+        key = _cache_key(endpoint, params)
+        if ttl:
+            content = self.cache.get(key)
+            if content is not None:
+                logger.debug("Cache hit: %s", key)
+                return _slices(content)
+
+        logger.debug("Streaming a call: %s - %s", endpoint, params)
+        response = self.transport.get(
+            f"{BASE_URL}/{endpoint}", params=params, stream=True
+        )
+        _handle_response(response, raise_for_status=True)
+        return self._read(response, key, ttl)
+
+    def _read(self, response, key, ttl):
+        chunks = []
+        with response:
+            for chunk in response.iter_content(_CHUNK_SIZE):
+                if ttl:
+                    chunks.append(chunk)
+                yield chunk
+
+        if ttl:
+            self.cache.set(key, b"".join(chunks), ttl)
+
     def post(self, endpoint: str, data: dict, raise_for_status=True):
         logger.debug("Making a call: %s - %s", endpoint, data)
-        response = self._session.post(f"{BASE_URL}/{endpoint}", data=data)
+        response = self.transport.post(f"{BASE_URL}/{endpoint}", data=data)
         return _handle_response(response, raise_for_status)
 
     @property
@@ -118,6 +227,98 @@ class Client:
         DownloadableTrack.from_id(self, "156914988", 5)
 
 
+def _cache_key(endpoint, params):
+    # requests drops None params, so they don't take part in the key either
+    items = sorted(
+        (str(key), str(value)) for key, value in params.items() if value is not None
+    )
+    return f"{endpoint}?{urllib.parse.urlencode(items)}"
+
+
+_CHUNK_SIZE = 64 * 1024
+
+
+def _slices(content):
+    for start in range(0, len(content), _CHUNK_SIZE):
+        yield content[start : start + _CHUNK_SIZE]
+
+
+def _cached_response(endpoint, content):
+    response = requests.Response()
+    response.status_code = 200
+    response.url = f"{BASE_URL}/{endpoint}"
+    response._content = content
+    return response
+
+
+class IdentityMap:
+    """Weak-valued map of the entities built by a client, keyed by type and ID.
+
+    Entities are shared while something holds a reference to them, so the
+    same album or artist is built only once per ID. Observers are called
+    with every entity built or merged, so indexes can be filled from the
+    payloads already seen. Raw observers are called with the payloads read
+    without building entities (see Playlist.get_track_items).
+    """
+
+    def __init__(self):
+        self._refs = {}
+        self._observers = []
+        self._raw_observers = []
+        # Reentrant: collecting an entity may run _discard while adding
+        self._lock = threading.RLock()
+
+    def subscribe(self, callback):
+        self._observers.append(callback)
+
+    def subscribe_raw(self, callback):
+        self._raw_observers.append(callback)
+
+    def notify(self, item):
+        for callback in self._observers:
+            try:
+                callback(item)
+            except Exception as error:
+                logger.warning("%s raised observing %s: %s", type(error), item, error)
+
+    def notify_raw(self, cls, data):
+        "Call the raw observers with the payload of an entity of class cls"
+        for callback in self._raw_observers:
+            try:
+                callback(cls, data)
+            except Exception as error:
+                logger.warning(
+                    "%s raised observing %s %s: %s",
+                    type(error),
+                    cls.__name__,
+                    data.get("id"),
+                    error,
+                )
+
+    def get(self, cls, id):
+        ref = self._refs.get((cls, str(id)))
+        return None if ref is None else ref()
+
+    def add(self, item):
+        "Add the item. Return the instance already mapped to its ID, if any."
+        key = (type(item), str(item.id))
+        with self._lock:
+            existing = self.get(*key)
+            if existing is not None:
+                return existing
+
+            self._refs[key] = weakref.ref(item, lambda ref: self._discard(key, ref))
+            return item
+
+    def _discard(self, key, ref):
+        with self._lock:
+            if self._refs.get(key) is ref:
+                del self._refs[key]
+
+    def __len__(self):
+        return len(self._refs)
+
+
 _exception_codes = {400: BadRequestError, 401: AuthenticationError, 404: NotFoundError}
 
 
@@ -125,6 +326,11 @@ def _handle_response(response, raise_for_status):
     if response.status_code == 200 or not raise_for_status:
         return response
 
+    if response.status_code >= 500:
+        raise ServiceUnavailableError(
+            f"{response.status_code}: {_get_message(response)}"
+        )
+
     try:
         raise _exception_codes[response.status_code](_get_message(response))
     except KeyError:
@@ -140,14 +346,29 @@ def _get_message(response):
 
 
 class DownloadableTrack:
+    __slots__ = (
+        "id",
+        "url",
+        "duration",
+        "bit_depth",
+        "sampling_rate",
+        "restrictions",
+        "etsp",
+        "demo",
+        "_mime_type",
+        "_client",
+        "_size",
+    )
+
     def __init__(self, client: Client, data: dict):
-        self._data = data
         self.id = data["track_id"]
         self.url = data.get("url")
         self.duration = data.get("duration")
         self.bit_depth = data.get("bit_depth", 16)
         self.sampling_rate = data.get("sampling_rate", 44.1)
         self.restrictions = data.get("restrictions", [])
+        self.demo = "sample" in data or not data.get("sampling_rate")
+        self._mime_type = data.get("mime_type", "n/a")
 
         try:
             self.etsp = datetime.datetime.fromtimestamp(
@@ -217,24 +438,20 @@ class DownloadableTrack:
         except (KeyError, IndexError):
             return False
 
-    @property
-    def demo(self):
-        return "sample" in self._data or not self._data.get("sampling_rate")
-
     @property
     def size(self):
         if self.url is None:
             return 0
 
         if self._size is None:
-            response = self._client._session.head(self.url, allow_redirects=True)
+            response = self._client.cdn.head(self.url, allow_redirects=True)
             self._size = response.headers.get("Content-Length", 0)
 
         return self._size
 
     @property
     def extension(self):
-        if "flac" in self._data.get("mime_type", "n/a"):
+        if "flac" in self._mime_type:
             return "FLAC"
 
         return "MP3"
@@ -244,8 +461,23 @@ class DownloadableTrack:
 
 
 class _WithMetadata:
+    """Base of the entities.
+
+    Entities are slotted and keep only the attributes the translators and
+    playback use. Every subclass lists them, with their defaults, in
+    _defaults; the payload keys in _lazy are read from the full payload
+    (see _get_details) when asked for, instead of being kept.
+    """
+
+    __slots__ = ("id", "_client", "_keys", "__weakref__")
+
     _endpoint = "album/get"
     _param = "album_id"
+    _search_endpoint = "album/search"
+    _search_key = "albums"
+
+    _defaults = {}
+    _lazy = frozenset()
 
     def __init__(self, client: Client, data: dict):
         try:
@@ -253,24 +485,97 @@ class _WithMetadata:
         except KeyError:
             raise ValueError("Can't construct without ID")
 
+        for name, value in self._defaults.items():
+            setattr(self, name, value)
+
         self._client = client
-        self._metadata = data.get("metadata")
+        self._keys = _intern_keys(data.keys())
 
-    def _get_metadata(self):
-        logger.debug("Getting metadata for ID: %s", id)
-        if self._metadata is None:
-            self._metadata = self._client.get(
-                self._endpoint, params={self._param: self.id}
-            ).json()
-            return self._metadata
+    def __getattr__(self, name):
+        # Only called for the attributes not found in the slots
+        if name in self._lazy:
+            return self._get_details().get(name)
+
+        raise AttributeError(f"{type(self).__name__} has no attribute {name!r}")
+
+    def _is_richer(self, data):
+        "Whether the payload has keys this entity hasn't been built from yet."
+        return not data.keys() <= self._keys
+
+    def _merge(self, data):
+        "Merge a (possibly richer) payload of the same entity into this one."
+        self._keys = _intern_keys(self._keys | data.keys())
 
-        logger.debug("Metadata already loaded")
-        return self._metadata
+    def _get_details(self):
+        # Not kept: repeated calls are served by the client's cache
+        logger.debug("Getting metadata for ID: %s", self.id)
+        return self._client.get(self._endpoint, params={self._param: self.id}).json()
+
+    def _get_metadata(self):
+        return self._get_details()
 
     @classmethod
     def from_id(cls, client, id):
         response = client.get(cls._endpoint, params={cls._param: id}).json()
-        return cls(client, response)
+        return cls.from_data(client, response)
+
+    @classmethod
+    def from_search(cls, client, query, limit=10):
+        response = client.get(cls._search_endpoint, cls._search_params(query, limit))
+        return cls._from_search_response(client, response.json())
+
+    @classmethod
+    def _search_params(cls, query, limit):
+        return {"query": query, "limit": limit}
+
+    @classmethod
+    def _from_search_response(cls, client, response):
+        try:
+            return [
+                cls.from_data(client, item)
+                for item in response[cls._search_key]["items"]
+            ]
+        except (IndexError, KeyError):
+            return []
+
+    @classmethod
+    def from_data(cls, client, data, **kwargs):
+        """
+        Get the entity from the client's identity map, merging the data into
+        it, or build it if it's not there yet.
+
+        raises ValueError if the data has no ID
+        """
+        try:
+            id = data["id"]
+        except KeyError:
+            raise ValueError("Can't construct without ID")
+
+        item = client.entities.get(cls, id)
+        if item is None:
+            new_item = cls(client, data, **kwargs)
+            item = client.entities.add(new_item)
+            if item is new_item:
+                client.entities.notify(item)
+                return item
+
+        if kwargs or item._is_richer(data):
+            item._merge(data, **kwargs)
+            client.entities.notify(item)
+
+        return item
+
+
+_KEYSETS = {}
+
+
+def _intern_keys(keys):
+    # Payloads of the same kind share their key sets
+    keys = frozenset(keys)
+    return _KEYSETS.setdefault(keys, keys)
+
+
+_PAGE_SIZE = 500
 
 
 # This class should be removed
@@ -280,96 +585,204 @@ class _BigWithMetadata(_WithMetadata):
     _key = "albums_count"
     _extra = "albums"
 
-    def __init__(self, client: Client, data):
-        super().__init__(client, data)
-        self._metadata = None
+    __slots__ = ()
 
     def _get_metadata(self):
-        return self._multi_meta(self._key, self._extra)
-
-    def _multi_meta(self, key, extra):
-        total = 1
-        offset = 0
-        while total > 0:
-            j = self._client.get(
-                self._endpoint,
-                {
-                    self._param: self.id,
-                    "offset": offset,
-                    # "type": None,
-                    "extra": extra,
-                },
-            ).json()
+        return self._iter_items(self._key, self._extra)
 
-            if offset == 0:
-                yield j
-                try:
-                    total = j[key] - 500
-                except (KeyError, IndexError) as error:
-                    logger.debug(
-                        "%s raised trying to fetch metadata: %s", type(error), error
+    def _iter_items(self, key, extra):
+        """
+        Yield the raw items of every page of the extra listing. The first
+        page tells the count; the next ones are read concurrently by
+        workers, which hand the chunks of their bodies over through queues.
+        Items are parsed from the chunks as they come (see jsonstream), so
+        they're yielded while the page is read, and it's never decoded whole.
+        """
+        first = self._get_page(extra, 0)
+        try:
+            yield from first[extra]["items"]
+            total = first[key]
+        except (KeyError, IndexError, TypeError) as error:
+            logger.debug("%s raised trying to fetch metadata: %s", type(error), error)
+            return
+
+        del first
+
+        # The first page tells the count, so the remaining offsets are known
+        offsets = range(_PAGE_SIZE, total, _PAGE_SIZE)
+        if not offsets:
+            return
+
+        workers = min(self._client.max_workers, len(offsets))
+        stop = threading.Event()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # The next pages are read while the current one is parsed
+            pages = collections.deque()
+            try:
+                for offset in offsets:
+                    chunks = queue.Queue(maxsize=_QUEUED_CHUNKS)
+                    future = executor.submit(
+                        self._read_page, extra, offset, chunks, stop
                     )
-                    break
-            else:
-                yield j
-                total -= 500
+                    pages.append((future, chunks))
+                    if len(pages) > workers:
+                        yield from _parse_page(*pages.popleft(), extra)
+
+                while pages:
+                    yield from _parse_page(*pages.popleft(), extra)
+            finally:
+                # Stopped early: the workers close their responses, and the
+                # pages not requested yet never will be
+                stop.set()
+                for future, _ in pages:
+                    future.cancel()
+
+    def _read_page(self, extra, offset, chunks, stop):
+        "Put the chunks of the body of a page in the queue while it's read"
+        body = None
+        try:
+            body = self._client.stream(
+                self._endpoint, self._page_params(extra, offset, _PAGE_SIZE)
+            )
+            for chunk in body:
+                if not _put(chunks, chunk, stop):
+                    return
+        finally:
+            if body is not None:
+                body.close()
+            # Even after an error, which _received raises once it gets _END
+            _put(chunks, _END, stop)
+
+    def _get_page(self, extra, offset, limit=_PAGE_SIZE):
+        return self._client.get(
+            self._endpoint, self._page_params(extra, offset, limit)
+        ).json()
+
+    def _page_params(self, extra, offset, limit):
+        return {
+            self._param: self.id,
+            "offset": offset,
+            "limit": limit,
+            # "type": None,
+            "extra": extra,
+        }
+
+
+# Chunks read ahead of the parser, by page: more than a page, so that the
+# downloads are never held back
+_QUEUED_CHUNKS = 64
+# Seconds between two checks of the stop event, while a queue is full
+_PUT_TIMEOUT = 0.1
+_END = object()
+
+
+def _put(chunks, chunk, stop):
+    "Put the chunk in the queue, unless stop is set first. Return if it was."
+    while not stop.is_set():
+        try:
+            chunks.put(chunk, timeout=_PUT_TIMEOUT)
+            return True
+        except queue.Full:
+            pass
+
+    return False
+
 
-            offset += 500
+def _parse_page(future, chunks, extra):
+    "Yield the items of a page, parsed from the chunks put by _read_page"
+    received = _received(future, chunks)
+    yield from jsonstream.iter_items(received, extra)
+    collections.deque(received, maxlen=0)  # The rest, or the worker's error
+
+
+def _received(future, chunks):
+    while True:
+        chunk = chunks.get()
+        if chunk is _END:
+            future.result()  # Raises what the worker raised
+            return
+
+        yield chunk
 
 
 class Track(_WithMetadata):
     _endpoint = "track/get"
     _param = "track_id"
+    _search_endpoint = "track/search"
+    _search_key = "tracks"
+
+    # Defaults, overridden by the payload keys (see _update)
+    _defaults = {
+        "title": None,
+        "duration": 0,
+        "release_date_original": None,
+        "version": None,
+        "media_number": 1,
+        "track_number": 1,
+        "streamable": False,
+        "hires_streamable": False,
+        "album": None,
+        "artist": None,
+        "composer": None,
+    }
+    __slots__ = tuple(_defaults)
+
+    _lazy = frozenset(
+        (
+            "copyright",
+            "work",
+            "audio_info",
+            "purchasable",
+            "parental_warning",
+            "maximum_sampling_rate",
+            "maximum_channel_count",
+        )
+    )
 
     def __init__(self, client: Client, data: dict, album=None, artist=None):
         super().__init__(client, data)
+        self._update(data, album, artist)
 
+    def _merge(self, data, album=None, artist=None):
+        super()._merge(data)
+        self._update(data, album, artist)
+
+    def _update(self, data, album=None, artist=None):
         # Ignored keys (for now): release_date_download, release_date_stream,
         # purchasable, purchasable_at previewable, sampleable, articles, performers
 
-        self.title = data.get("title")
-        self.copyright = data.get("copyright")
-        self.work = data.get("work")
-        self.audio_info = data.get("audio_info")
-        self.duration = data.get("duration", 0)
-        self.release_date_original = data.get("release_date_original")
-        self.purchasable = data.get("purchasable", False)
-        self.work = data.get("work")
-        self.version = data.get("version")
-        self.media_number = data.get("media_number", 1)
-        self.track_number = data.get("track_number", 1)
-        self.parental_warning = data.get("parental_warning", False)
-        self.maximum_sampling_rate = data.get("maximum_sampling_rate")
-        self.maximum_channel_count = data.get("maximum_channel_count")
-        self.streamable = data.get("streamable", False)
-        self.hires_streamable = data.get("hires_streamable", False)
-
-        self.album = album or Album(client, data.get("album", {}))
+        self.title = data.get("title", self.title)
+        self.duration = data.get("duration", self.duration)
+        self.release_date_original = data.get(
+            "release_date_original", self.release_date_original
+        )
+        self.version = data.get("version", self.version)
+        self.media_number = data.get("media_number", self.media_number)
+        self.track_number = data.get("track_number", self.track_number)
+        self.streamable = data.get("streamable", self.streamable)
+        self.hires_streamable = data.get("hires_streamable", self.hires_streamable)
+
+        if album is not None:
+            self.album = album
+        elif self.album is None or "album" in data:
+            self.album = Album.from_data(self._client, data.get("album", {}))
 
         performer = data.get("performer")
         if artist is not None:
             self.artist = artist
         elif performer is not None:
-            self.artist = Artist(client, performer)
-        else:
+            self.artist = Artist.from_data(self._client, performer)
+        elif self.artist is None:
             self.artist = self.album.artist
 
-        self.composer = data.get("composer")
-        if self.composer is not None:
-            self.composer = Artist(client, self.composer)
+        composer = data.get("composer")
+        if composer is not None:
+            self.composer = Artist.from_data(self._client, composer)
 
     @property
     def uri(self):
         return f"qobuz:track:{self.id}"
 
-    @classmethod
-    def from_search(cls, client, query, limit=10):
-        tracks = client.get("track/search", {"query": query, "limit": limit}).json()
-        try:
-            return [cls(client, item) for item in tracks["tracks"]["items"]]
-        except (IndexError, KeyError):
-            return []
-
     def get_downloadable(self, format_id=6, intent="stream"):
         """
         :param format_id:
@@ -386,6 +799,8 @@ class Track(_WithMetadata):
 
 
 class _WithImageMixin:
+    __slots__ = ()
+
     _image: dict
 
     def image(self, key="large"):
@@ -399,39 +814,68 @@ class _WithImageMixin:
 
 
 class Album(_WithMetadata, _WithImageMixin):
+    # Defaults, overridden by the payload keys (see _update)
+    _defaults = {
+        "title": "Unknown",
+        "_image": {},
+        "version": None,
+        "tracks_count": 1,
+        "release_date_original": None,
+        "release_type": None,
+        "hires_streamable": False,
+        "streamable": None,
+        "artist": None,
+        "_tracks": None,
+    }
+    __slots__ = tuple(_defaults)
+
+    _lazy = frozenset(
+        ("released_at", "media_count", "upc", "duration", "parental_warning")
+    )
+
     def __init__(self, client: Client, data: dict):
         super().__init__(client, data)
+        self._update(data)
+
+    def _merge(self, data):
+        super()._merge(data)
+        self._update(data)
+
+    def _update(self, data):
+        self.title = data.get("title", self.title)
+        self._image = data.get("image", self._image)
+        self.version = data.get("version", self.version)
+        self.tracks_count = data.get("tracks_count", self.tracks_count)
+        self.release_date_original = data.get(
+            "release_date_original", self.release_date_original
+        )
+        self.release_type = data.get("release_type", self.release_type)
+        self.hires_streamable = data.get("hires_streamable", self.hires_streamable)
 
-        self.title = data.get("title", "Unknown")
-        self.released_at = data.get("released_at")
-        self._image = data.get("image", {})
-        self.media_count = data.get("media_count")
-        self.version = data.get("version")
-        self.upc = data.get("upc")
-        self.duration = data.get("duration")
-        self.tracks_count = data.get("tracks_count", 1)
-        self.release_date_original = data.get("release_date_original")
-        self.release_type = data.get("release_type")
-        self.parental_warning = data.get("parental_warning", False)
-        self.hires_streamable = data.get("hires_streamable", False)
-        self.streamable = data.get("streamable", self.hires_streamable)
-        self.artist = Artist(client, data.get("artist"))
-
-        self._tracks = data.get("tracks", {}).get("items")
-        if self._tracks is not None:
+        if "streamable" in data:
+            self.streamable = data["streamable"]
+        elif self.streamable is None:
+            self.streamable = self.hires_streamable
+
+        if self.artist is None or "artist" in data:
+            self.artist = Artist.from_data(self._client, data.get("artist"))
+
+        tracks = data.get("tracks", {}).get("items")
+        if tracks is not None:
             self._tracks = [
-                Track(self._client, track, album=self) for track in self._tracks
+                Track.from_data(self._client, track, album=self) for track in tracks
             ]
 
-        self.label = data.get("label")
-        if self.label is not None:
-            self.label = Label(client, self.label)
+    @property
+    def label(self):
+        data = self._get_details().get("label")
+        return None if data is None else Label.from_data(self._client, data)
 
     @property
     def tracks(self):
         if self._tracks is None:
             self._tracks = [
-                Track(self._client, track, album=self)
+                Track.from_data(self._client, track, album=self)
                 for track in self._get_metadata()["tracks"]["items"]
             ]
 
@@ -442,14 +886,8 @@ class Album(_WithMetadata, _WithImageMixin):
         return f"qobuz:album:{self.id}"
 
     @classmethod
-    def from_search(cls, client, query, limit=10):
-        albums = client.get(
-            "album/search", {"query": query, "limit": limit, "extra": "release_type"}
-        ).json()
-        try:
-            return [cls(client, item) for item in albums["albums"]["items"]]
-        except (IndexError, KeyError):
-            return []
+    def _search_params(cls, query, limit):
+        return {"query": query, "limit": limit, "extra": "release_type"}
 
     def __hash__(self):
         return hash(self.uri)
@@ -459,53 +897,82 @@ class Album(_WithMetadata, _WithImageMixin):
 
 
 class Artist(_BigWithMetadata, _WithImageMixin):
+    _search_endpoint = "artist/search"
+    _search_key = "artists"
+
+    # Defaults, overridden by the payload keys (see _update)
+    _defaults = {"name": "Unknown", "_image": None, "_albums": None, "_tracks": None}
+    __slots__ = tuple(_defaults)
+
+    _lazy = frozenset(
+        (
+            "albums_as_primary_artist_count",
+            "albums_as_primary_composer_count",
+            "picture",
+            "albums_count",
+            "slug",
+            "similar_artist_ids",
+            "information",
+            "biography",
+        )
+    )
+
     def __init__(self, client: Client, data, albums=None, tracks=None):
         super().__init__(client, data)
+        self._update(data, albums, tracks)
 
-        self.name = data.get("name", "Unknown")
-        self.albums_as_primary_artist_count = data.get("albums_as_primary_artist_count")
-        self.albums_as_primary_composer_count = data.get(
-            "albums_as_primary_composer_count"
-        )
-        self.picture = data.get("picture")
-        self.albums_count = data.get("albums_count")
-        self.slug = data.get("slug")
-        self._image = data.get("image")
-        self.picture = data.get("picture")
-        self.similar_artist_ids = data.get("similar_artist_ids")
-        self.information = data.get("information")
-        self.biography = data.get("biography")
-        self._albums = albums
-        self._tracks = tracks
+    def _merge(self, data, albums=None, tracks=None):
+        super()._merge(data)
+        self._update(data, albums, tracks)
+
+    def _update(self, data, albums=None, tracks=None):
+        self.name = data.get("name", self.name)
+        self._image = data.get("image", self._image)
+
+        if albums is not None:
+            self._albums = albums
+
+        if tracks is not None:
+            self._tracks = tracks
+
+    def get_albums_page(self, offset=0, limit=100):
+        "Return a Page of the artist's albums, without loading the others"
+        data = self._get_page("albums", offset, limit)
+        return _to_page(self._client, Album, data.get("albums"))
+
+    def iter_albums(self):
+        """
+        Yield the artist's albums, fetching the pages as they're needed:
+        stopping early (e.g. with itertools.islice) spares the next ones.
+        """
+        if self._albums is not None:
+            yield from self._albums
+            return
+
+        for data in self._get_metadata():
+            yield Album.from_data(self._client, data)
+
+    def iter_tracks(self):
+        "Yield the artist's tracks, fetching the pages as they're needed"
+        if self._tracks is not None:
+            yield from self._tracks
+            return
+
+        # TODO: Sort by popularity
+        for data in self._iter_items("tracks_count", "tracks_appears_on"):
+            yield Track.from_data(self._client, data)
 
     @property
     def albums(self):
         if self._albums is None:
-            self._albums = []
-            for iterable in self._get_metadata():
-                try:
-                    self._albums.extend(
-                        Album(self._client, data)
-                        for data in iterable["albums"]["items"]
-                    )
-                except KeyError as error:
-                    logger.debug("Unexpected KeyError fetching data: %s", error)
+            self._albums = list(self.iter_albums())
 
         return self._albums
 
     @property
     def tracks(self):
         if self._tracks is None:
-            self._tracks = []
-            # TODO: Sort by popularity
-            for iterable in self._multi_meta("tracks_count", "tracks_appears_on"):
-                try:
-                    self._tracks.extend(
-                        Track(self._client, data)
-                        for data in iterable["tracks_appears_on"]["items"]
-                    )
-                except KeyError as error:
-                    logger.debug("Unexpected KeyError fetching data: %s", error)
+            self._tracks = list(self.iter_tracks())
 
         return self._tracks
 
@@ -513,14 +980,6 @@ class Artist(_BigWithMetadata, _WithImageMixin):
     def uri(self):
         return f"qobuz:artist:{self.id}"
 
-    @classmethod
-    def from_search(cls, client, query, limit=10):
-        artists = client.get("artist/search", {"query": query, "limit": limit}).json()
-        try:
-            return [cls(client, item) for item in artists["artists"]["items"]]
-        except (IndexError, KeyError):
-            return []
-
     def __hash__(self):
         return hash(self.uri)
 
@@ -534,15 +993,46 @@ class Playlist(_BigWithMetadata):
     _key = "tracks_count"
     _extra = "tracks"
 
+    # Defaults, overridden by the payload keys (see _update)
+    _defaults = {
+        "name": "Unknown",
+        "tracks_count": None,
+        "duration": None,
+        "_tracks": None,
+        "_deleted": False,
+    }
+    __slots__ = tuple(_defaults)
+
     def __init__(self, client, data: dict):
         super().__init__(client, data)
+        self._update(data)
 
-        self.id = data.get("id")
-        self.name = data.get("name", "Unknown")
-        self.tracks_count = data.get("tracks_count")
-        self.duration = data.get("duration")
-        self._tracks = None
-        self._deleted = False
+    def _merge(self, data):
+        super()._merge(data)
+        self._update(data)
+
+    def _is_richer(self, data):
+        # Always merge: the tracks count tells whether the playlist changed
+        return True
+
+    @classmethod
+    def from_id(cls, client, id):
+        # The user's own playlists are served by the library mirror
+        data = None if client.mirror is None else client.mirror.playlist(id)
+        if data is not None:
+            return cls.from_data(client, data)
+
+        return super().from_id(client, id)
+
+    def _update(self, data):
+        tracks_count = data.get("tracks_count", self.tracks_count)
+        if tracks_count != self.tracks_count:
+            # The playlist changed: drop the loaded tracks
+            self.refresh()
+
+        self.name = data.get("name", self.name)
+        self.tracks_count = tracks_count
+        self.duration = data.get("duration", self.duration)
 
     @classmethod
     def create(
@@ -572,19 +1062,53 @@ class Playlist(_BigWithMetadata):
     @property
     def tracks(self):
         if self._tracks is None:
-            self._tracks = []
-            # TODO: Sort by popularity
-            for iterable in self._multi_meta("tracks_count", "tracks"):
-                try:
-                    self._tracks.extend(
-                        Track(self._client, data)
-                        for data in iterable["tracks"]["items"]
-                    )
-                except KeyError as error:
-                    logger.debug("Unexpected KeyError fetching data: %s", error)
+            self._tracks = list(self.iter_tracks())
 
         return self._tracks
 
+    def iter_tracks(self):
+        """
+        Yield the playlist's tracks, fetching the pages as they're needed:
+        stopping early (e.g. with itertools.islice) spares the next ones.
+        """
+        if self._tracks is not None:
+            yield from self._tracks
+            return
+
+        # TODO: Sort by popularity
+        for data in self._track_items():
+            yield Track.from_data(self._client, data)
+
+    def get_track_items(self):
+        """Yield the raw payloads of the playlist's tracks, without building
+        entities (see translators.to_tracks). Raw observers see them."""
+        entities = self._client.entities
+        for data in self._track_items():
+            entities.notify_raw(Track, data)
+            yield data
+
+    def _track_items(self):
+        mirrored = self._mirrored_tracks()
+        if mirrored is not None:
+            yield from mirrored["items"]
+            return
+
+        yield from self._iter_items("tracks_count", "tracks")
+
+    def get_tracks_page(self, offset=0, limit=100):
+        "Return a Page of the playlist's tracks, without loading the others"
+        data = self._mirrored_tracks(offset, limit)
+        if data is None:
+            data = self._get_page("tracks", offset, limit).get("tracks")
+
+        return _to_page(self._client, Track, data)
+
+    def _mirrored_tracks(self, offset=0, limit=None):
+        if self._client.mirror is None:
+            return None
+
+        return self._client.mirror.playlist_tracks(self.id, offset, limit)
+
     def subscribe(self):
         response = self._client.post(
             "playlist/subscribe", {"playlist_id": str(self.id)}
@@ -628,11 +1152,19 @@ class Label(_BigWithMetadata):
     _key = "albums_count"
     _extra = "albums"
 
+    _defaults = {"name": "Unknown"}
+    __slots__ = tuple(_defaults)
+
     def __init__(self, client, data: dict):
         super().__init__(client, data)
+        self._update(data)
 
-        self.id = data.get("id")
-        self.name = data.get("name", "Unknown")
+    def _merge(self, data):
+        super()._merge(data)
+        self._update(data)
+
+    def _update(self, data):
+        self.name = data.get("name", self.name)
 
     def __repr__(self):
         return f"<Label {self.id}: {self.name}>"
@@ -643,39 +1175,37 @@ class User:
         self._client = client
 
     def get_playlists(self, limit=10):
-        response = self._client.get(
-            "playlist/getUserPlaylists", {"limit": limit}
-        ).json()
-        try:
-            return [
-                Playlist(self._client, data) for data in response["playlists"]["items"]
-            ]
-        except (KeyError, TypeError):
-            return []
+        return self.get_playlists_page(limit=limit).items
+
+    def get_playlists_page(self, offset=0, limit=100):
+        mirror = self._client.mirror
+        data = None if mirror is None else mirror.playlists(offset, limit)
+        if data is None:
+            response = self._client.get(
+                "playlist/getUserPlaylists", {"offset": offset, "limit": limit}
+            ).json()
+            data = response.get("playlists")
+
+        return _to_page(self._client, Playlist, data)
+
+    def get_favorites_page(self, type="albums", offset=0, limit=100):
+        "Return a Page of the favorite albums, artists or tracks"
+        mirror = self._client.mirror
+        data = None if mirror is None else mirror.favorites(type, offset, limit)
+        if data is None:
+            response = self._client.get(
+                "favorite/getUserFavorites",
+                {"type": type, "offset": offset, "limit": limit},
+            ).json()
+            data = response.get(type)
 
-    def get_favorites(self, type="albums", offset=0, limit=10):
-        # TODO: serialize more types
-        response = self._client.get(
-            "favorite/getUserFavorites",
-            {"type": type, "offset": offset, "limit": limit},
-        ).json()
+        return _to_page(self._client, _FAVORITE_TYPES[type], data)
 
-        try:
-            return [Album(self._client, data) for data in response["albums"]["items"]]
-        except KeyError:
-            return []
+    def get_favorites(self, type="albums", offset=0, limit=10):
+        return self.get_favorites_page(type, offset, limit).items
 
     def get_favorites_artists(self, type="artists", offset=0, limit=400):
-        # TODO: serialize more types
-        response = self._client.get(
-            "favorite/getUserFavorites",
-            {"type": type, "offset": offset, "limit": limit},
-        ).json()
-
-        try:
-            return [Artist(self._client, data) for data in response["artists"]["items"]]
-        except KeyError:
-            return []
+        return self.get_favorites_page(type, offset, limit).items
 
     def modify_favorites(self, method="create", albums=None, artists=None, tracks=None):
         data = {
@@ -684,9 +1214,31 @@ class User:
             "track_ids": _to_str_list(tracks),
         }
         response = self._client.post(f"favorite/{method}", data)
+        if self._client.mirror is not None:
+            self._client.mirror.sync_favorites(self._client)
+
         return response.json()
 
 
+# A slice of a listing, and the size of the whole listing
+Page = collections.namedtuple("Page", ["items", "total"])
+
+
+def _to_page(client, cls, data):
+    try:
+        items = data["items"]
+    except (KeyError, TypeError):
+        return Page([], 0)
+
+    return Page(
+        [cls.from_data(client, item) for item in items],
+        data.get("total", len(items)),
+    )
+
+
+_FAVORITE_TYPES = {"albums": Album, "artists": Artist, "tracks": Track}
+
+
 def _to_str_list(items):
     if items is None:
         return ""
@@ -750,7 +1302,7 @@ class Focus(_WithMetadata):
                 # 'streamable' key is missing here. Can we blatantly assume
                 # that is streamable?
                 data.update({"streamable": True})
-                albums.append(Album(self._client, data))
+                albums.append(Album.from_data(self._client, data))
 
         return albums
 
@@ -765,7 +1317,9 @@ class Focus(_WithMetadata):
                 continue
 
             try:
-                playlists.append(Playlist(self._client, containers[key]["playlist"]))
+                playlists.append(
+                    Playlist.from_data(self._client, containers[key]["playlist"])
+                )
             except KeyError:
                 logger.debug("No playlists found in %s container", containers[key])
                 continue
@@ -806,7 +1360,8 @@ class Featured:
 
         try:
             return [
-                Playlist(self._client, data) for data in response["playlists"]["items"]
+                Playlist.from_data(self._client, data)
+                for data in response["playlists"]["items"]
             ]
         except TypeError:
             return []
@@ -823,7 +1378,10 @@ class Featured:
         ).json()
 
         try:
-            return [Album(self._client, data) for data in response["albums"]["items"]]
+            return [
+                Album.from_data(self._client, data)
+                for data in response["albums"]["items"]
+            ]
         except TypeError:
             return []
 
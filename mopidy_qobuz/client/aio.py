@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import logging
+
+from mopidy_qobuz.client import Client
+from mopidy_qobuz.client import DownloadableTrack
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncClient:
+    """Coroutine interface to a blocking Client.
+
+    The blocking methods (and the classmethods of the entities) run in a
+    bounded thread pool, so dozens of them can be awaited concurrently from
+    one event loop. Everything else is the wrapped client's: session, cache,
+    identity map, library mirror and signing logic. The returned entities
+    are the regular model classes bound to it.
+    """
+
+    def __init__(self, client: Client, max_workers=16):
+        self.client = client
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="qobuz-async"
+        )
+
+    async def get(self, endpoint: str, params: dict, raise_for_status=True):
+        return await self._run(self.client.get, endpoint, params, raise_for_status)
+
+    async def post(self, endpoint: str, data: dict, raise_for_status=True):
+        return await self._run(self.client.post, endpoint, data, raise_for_status)
+
+    async def from_id(self, cls, id):
+        """
+        :param cls: Album, Artist, Track, Playlist or Label
+        """
+        return await self._run(cls.from_id, self.client, id)
+
+    async def from_search(self, cls, query, limit=10):
+        """
+        :param cls: Album, Artist or Track
+        """
+        return await self._run(cls.from_search, self.client, query, limit)
+
+    async def get_downloadable(self, id, format_id=6, intent="stream"):
+        """
+        raises InvalidQuality, TrackUrlNotFoundError, InvalidAppSecretError
+        """
+        return await self._run(
+            DownloadableTrack.from_id, self.client, id, format_id, intent
+        )
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args)
+        )
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Once over budget, the SQLite cache is evicted down to this share of it, so
+# that eviction runs every so often instead of on every set
+_LOW_WATER = 0.9
+# Least recently used rows read at a time when evicting
+_EVICT_BATCH = 256
+
+
+class Cache:
+    """Base class for the response caches used by Client.get.
+
+    Values are the raw response bodies (bytes). Subclasses must be safe to
+    use from several threads.
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemoryCache(Cache):
+    """In-memory cache with a size budget (in bytes) and LRU eviction."""
+
+    def __init__(self, max_size=16 * 1024 * 1024):
+        self.max_size = max_size
+        self._items = collections.OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                expires, value = self._items[key]
+            except KeyError:
+                return None
+
+            if expires < time.time():
+                self._pop(key)
+                return None
+
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            if key in self._items:
+                self._pop(key)
+
+            self._items[key] = (time.time() + ttl, value)
+            self._size += len(value)
+
+            while self._size > self.max_size and self._items:
+                self._pop(next(iter(self._items)))
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._items:
+                self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+    def _pop(self, key):
+        _, value = self._items.pop(key)
+        self._size -= len(value)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class SQLiteCache(Cache):
+    """Persistent cache backed by a SQLite file.
+
+    Entries survive restarts. Once the stored bodies exceed max_size bytes,
+    the expired entries, then the least recently used ones, are evicted
+    down to a low-water mark.
+    """
+
+    def __init__(self, path, max_size=64 * 1024 * 1024):
+        self.path = str(path)
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._touched = {}
+
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value BLOB, expires REAL, accessed REAL, "
+            "size INTEGER)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_expires ON responses (expires)"
+        )
+        self._conn.commit()
+
+        self._size = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        logger.debug("Opened %s (%d bytes cached)", self.path, self._size)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, expires = row
+            if expires < now:
+                self._delete(key)
+                self._conn.commit()
+                return None
+
+            # Access times are written in batches to keep reads cheap
+            self._touched[key] = now
+            return value
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._lock:
+            self._flush_touched()
+            self._delete(key)
+            self._conn.execute(
+                "INSERT INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, value, now + ttl, now, len(value)),
+            )
+            self._size += len(value)
+            self._evict()
+            self._conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._delete(key)
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._touched.clear()
+            self._size = 0
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+            self._conn.close()
+
+    def _delete(self, key):
+        row = self._conn.execute(
+            "SELECT size FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is not None:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._size -= row[0]
+
+    def _flush_touched(self):
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE responses SET accessed = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _evict(self):
+        if self._size <= self.max_size:
+            return
+
+        target = self.max_size * _LOW_WATER
+
+        # Expired entries go first, then the least recently used ones
+        now = time.time()
+        self._size -= self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses WHERE expires < ?", (now,)
+        ).fetchone()[0]
+        self._conn.execute("DELETE FROM responses WHERE expires < ?", (now,))
+
+        while self._size > target:
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed LIMIT ?",
+                (_EVICT_BATCH,),
+            ).fetchall()
+            if not rows:
+                break
+
+            keys = []
+            for key, size in rows:
+                if self._size <= target:
+                    break
+                keys.append((key,))
+                self._size -= size
+
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", keys)
+
+        logger.debug("Cache evicted down to %d bytes", self._size)
+
+
+class TTLCache:
+    """Bounded in-memory map of objects that expire ttl seconds after being
+    set. The least recently used entries make room when full."""
+
+    def __init__(self, ttl, max_items=128):
+        self.ttl = ttl
+        self.max_items = max_items
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                expires, value = self._items[key]
+            except KeyError:
+                return None
+
+            if expires < time.time():
+                del self._items[key]
+                return None
+
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = (time.time() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
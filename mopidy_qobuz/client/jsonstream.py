@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+import codecs
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_DELIMITER = re.compile(r"[\s,\]}]")
+
+
+def iter_items(chunks, key):
+    """Yield the items of the {key: {"items": [...]}} listing of a JSON
+    object, read from an iterable of byte chunks.
+
+    Items are decoded one at a time, while the chunks are read, so the
+    whole page is never held as a parsed tree. Values met before the
+    listing are decoded and dropped.
+
+    raises json.JSONDecodeError if the document is invalid or truncated
+    """
+    reader = _Reader(chunks)
+    if not (_enter(reader, key) and _enter(reader, "items")):
+        logger.debug("No %s items in the response", key)
+        return
+
+    reader.expect("[")
+    while reader.peek() != "]":
+        yield reader.value()
+        if reader.peek() == ",":
+            reader.pos += 1
+
+
+def _enter(reader, name):
+    "Move to the value of a key of the object at the position, if it's there"
+    if reader.peek() != "{":
+        return False
+
+    reader.pos += 1
+    while reader.peek() != "}":
+        key = reader.value()
+        reader.expect(":")
+        if key == name:
+            return True
+
+        reader.value()
+        if reader.peek() == ",":
+            reader.pos += 1
+
+    return False
+
+
+class _Reader:
+    "Text decoded from byte chunks; the consumed part is dropped as it goes."
+
+    def __init__(self, chunks):
+        self.buffer = ""
+        self.pos = 0
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._eof = False
+
+    def peek(self):
+        "Skip the whitespace, and return the next character ('' at the end)"
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos : self.pos + 1]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Expecting {char!r}", self.buffer, self.pos)
+
+        self.pos += 1
+
+    def value(self):
+        if self.peek() not in '{["':
+            # A number or literal is complete once followed by a delimiter
+            while not _DELIMITER.search(self.buffer, self.pos) and self._fill():
+                pass
+
+        while True:
+            try:
+                value, self.pos = _DECODER.raw_decode(self.buffer, self.pos)
+                return value
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+
+    def _fill(self):
+        "Append the next chunk to the buffer; return False at the end"
+        if self._eof:
+            return False
+
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._eof = True
+            text = self._decoder.decode(b"", final=True)
+        else:
+            text = self._decoder.decode(chunk)
+
+        self.buffer = self.buffer[self.pos :] + text
+        self.pos = 0
+        return chunk is not None or bool(text)
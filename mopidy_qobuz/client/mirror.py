@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+FAVORITE_TYPES = ("albums", "artists", "tracks")
+
+# Listings left out of the stored payloads: they're fetched when needed
+_STRIPPED_KEYS = ("tracks", "albums", "tracks_appears_on")
+
+_PAGE_SIZE = 500
+
+
+class LibraryMirror:
+    """Local copy of the user's library: favorites and playlists.
+
+    Raw payloads are stored in SQLite and served in the shape of the API
+    listings ({"items": [...], "total": n}), so the client builds entities
+    from them as usual. Listings are served once they have been synced
+    once; until then the methods return None and the API is used.
+
+    Syncs are incremental: only the favorites added since the last sync
+    (found in the pages of favorite/getUserFavorites, newest first), and
+    the playlists whose update time or track count changed, are fetched.
+    """
+
+    def __init__(self, path=None):
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            ":memory:" if path is None else str(path), check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS favorites ("
+            "type TEXT, id TEXT, position INTEGER, data TEXT, "
+            "PRIMARY KEY (type, id));"
+            "CREATE TABLE IF NOT EXISTS playlists ("
+            "id TEXT PRIMARY KEY, position INTEGER, version TEXT, data TEXT);"
+            "CREATE TABLE IF NOT EXISTS playlist_tracks ("
+            "playlist_id TEXT, position INTEGER, data TEXT, "
+            "PRIMARY KEY (playlist_id, position));"
+            "CREATE TABLE IF NOT EXISTS synced (name TEXT PRIMARY KEY, at REAL);"
+        )
+        self._conn.commit()
+
+    def favorites(self, type, offset=0, limit=None):
+        "Return a listing of the favorite albums, artists or tracks, or None"
+        return self._listing(
+            "favorites", "favorites", "type = ?", (type,), offset, limit
+        )
+
+    def playlists(self, offset=0, limit=None):
+        return self._listing("playlists", "playlists", "1", (), offset, limit)
+
+    def playlist(self, playlist_id):
+        "Return the payload of an owned playlist, or None"
+        with self._lock:
+            if not self._is_synced("playlists"):
+                return None
+
+            row = self._conn.execute(
+                "SELECT data FROM playlists WHERE id = ?", (str(playlist_id),)
+            ).fetchone()
+
+        return None if row is None else json.loads(row[0])
+
+    def playlist_tracks(self, playlist_id, offset=0, limit=None):
+        "Return a listing of the tracks of an owned playlist, or None"
+        if self.playlist(playlist_id) is None:
+            return None
+
+        return self._listing(
+            "playlists",
+            "playlist_tracks",
+            "playlist_id = ?",
+            (str(playlist_id),),
+            offset,
+            limit,
+        )
+
+    def sync(self, client):
+        self.sync_favorites(client)
+        self.sync_playlists(client)
+
+    def sync_favorites(self, client):
+        with self._sync_lock:
+            start = time.monotonic()
+            response = client.get("favorite/getUserFavoriteIds", {}).json()
+
+            # The IDs tell the order, and the favorites removed since
+            for type in FAVORITE_TYPES:
+                ids = [str(id) for id in response.get(type) or []]
+                with self._lock:
+                    known = {
+                        row[0]
+                        for row in self._conn.execute(
+                            "SELECT id FROM favorites WHERE type = ?", (type,)
+                        )
+                    }
+
+                new = {id for id in ids if id not in known}
+                fetched = _fetch_favorites(client, type, new) if new else []
+
+                with self._lock:
+                    self._conn.executemany(
+                        "DELETE FROM favorites WHERE type = ? AND id = ?",
+                        [(type, id) for id in known.difference(ids)],
+                    )
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO favorites VALUES (?, ?, ?, ?)",
+                        [(type, id, 0, json.dumps(data)) for id, data in fetched],
+                    )
+                    self._conn.executemany(
+                        "UPDATE favorites SET position = ? WHERE type = ? AND id = ?",
+                        [(position, type, id) for position, id in enumerate(ids)],
+                    )
+                    self._conn.commit()
+
+                logger.debug("Favorite %s: %d (%d new)", type, len(ids), len(fetched))
+
+            self._set_synced("favorites")
+            logger.info("Synced favorites in %.1f s", time.monotonic() - start)
+
+    def sync_playlists(self, client):
+        with self._sync_lock:
+            start = time.monotonic()
+            playlists = _fetch_pages(
+                client, "playlist/getUserPlaylists", {}, "playlists"
+            )
+
+            with self._lock:
+                versions = dict(
+                    self._conn.execute("SELECT id, version FROM playlists").fetchall()
+                )
+
+            changed = [
+                data
+                for data in playlists
+                if versions.get(str(data["id"])) != _playlist_version(data)
+            ]
+            workers = max(1, min(client.max_workers, len(changed)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                tracks = list(
+                    executor.map(lambda data: _playlist_tracks(client, data), changed)
+                )
+
+            removed = [
+                (id,) for id in versions.keys() - {str(d["id"]) for d in playlists}
+            ]
+            with self._lock:
+                self._conn.executemany("DELETE FROM playlists WHERE id = ?", removed)
+                self._conn.executemany(
+                    "DELETE FROM playlist_tracks WHERE playlist_id = ?", removed
+                )
+                for data, items in zip(changed, tracks):
+                    id = str(data["id"])
+                    self._conn.execute(
+                        "DELETE FROM playlist_tracks WHERE playlist_id = ?", (id,)
+                    )
+                    self._conn.executemany(
+                        "INSERT INTO playlist_tracks VALUES (?, ?, ?)",
+                        [(id, i, json.dumps(item)) for i, item in enumerate(items)],
+                    )
+
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO playlists VALUES (?, ?, ?, ?)",
+                    [
+                        (str(data["id"]), i, _playlist_version(data), json.dumps(data))
+                        for i, data in enumerate(playlists)
+                    ],
+                )
+                self._conn.commit()
+
+            self._set_synced("playlists")
+            logger.info(
+                "Synced %d playlists (%d changed) in %.1f s",
+                len(playlists),
+                len(changed),
+                time.monotonic() - start,
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _listing(self, name, table, where, params, offset, limit):
+        with self._lock:
+            if not self._is_synced(name):
+                return None
+
+            total = self._conn.execute(
+                f"SELECT COUNT(*) FROM {table} WHERE {where}", params
+            ).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT data FROM {table} WHERE {where} ORDER BY position "
+                "LIMIT ? OFFSET ?",
+                (*params, -1 if limit is None else limit, offset),
+            ).fetchall()
+
+        return {"items": [json.loads(row[0]) for row in rows], "total": total}
+
+    def _is_synced(self, name):
+        return (
+            self._conn.execute(
+                "SELECT 1 FROM synced WHERE name = ?", (name,)
+            ).fetchone()
+            is not None
+        )
+
+    def _set_synced(self, name):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO synced VALUES (?, ?)", (name, time.time())
+            )
+            self._conn.commit()
+
+
+def _fetch_favorites(client, type, ids):
+    """Return (ID, payload) pairs of the favorites with the given IDs, paging
+    through the favorites (newest first) until they're all found"""
+    found = {}
+    offset = 0
+    while len(found) < len(ids):
+        data = (
+            client.get(
+                "favorite/getUserFavorites",
+                {"type": type, "offset": offset, "limit": _PAGE_SIZE},
+                refresh=True,
+            )
+            .json()
+            .get(type)
+            or {}
+        )
+        items = data.get("items") or []
+        for item in items:
+            id = str(item["id"])
+            if id in ids:
+                found[id] = {
+                    key: val for key, val in item.items() if key not in _STRIPPED_KEYS
+                }
+
+        offset += len(items)
+        if not items or offset >= data.get("total", 0):
+            break
+
+    if len(found) < len(ids):
+        logger.debug("%d favorite %s not listed", len(ids) - len(found), type)
+
+    return list(found.items())
+
+
+def _fetch_pages(client, endpoint, params, key, refresh=True):
+    items = []
+    while True:
+        params = dict(params, offset=len(items), limit=_PAGE_SIZE)
+        data = client.get(endpoint, params, refresh=refresh).json()[key]
+        items.extend(data["items"])
+        if not data["items"] or len(items) >= data.get("total", 0):
+            return items
+
+
+def _playlist_tracks(client, data):
+    return _fetch_pages(
+        client, "playlist/get", {"playlist_id": data["id"], "extra": "tracks"}, "tracks"
+    )
+
+
+def _playlist_version(data):
+    return f"{data.get('updated_at')}:{data.get('tracks_count')}"
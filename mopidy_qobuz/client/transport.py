@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Seconds to connect, and between two bytes read
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 20
+
+# Statuses worth trying again: the API is overloaded or restarting
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+# Only these are retried; a POST might have been applied already
+_IDEMPOTENT_METHODS = frozenset(("GET", "HEAD"))
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    "Raised without a request while the API is considered down"
+
+
+class Transport:
+    """HTTP transport of the client, around a requests session.
+
+    Every request gets connect and read timeouts, so a hung socket can't
+    block a thread forever. Idempotent requests failing with a connection
+    error, a timeout or a retryable status are tried again, with an
+    exponential backoff and full jitter. Other errors are returned (or
+    raised) at once.
+
+    Consecutive failures open a circuit breaker: requests fail fast with
+    CircuitOpenError for reset_timeout seconds, then a single trial request
+    tells whether the API is back. A failure_threshold of None disables it.
+
+    :param pool_size: connections kept alive, for as many threads making
+        requests (ignored with a session given)
+    :param timeout: connect and read timeouts, in seconds
+    :param retries: tries after the first, for idempotent requests
+    :param backoff: base delay, in seconds, doubled at each try, and
+        max_backoff its maximum
+    :param failure_threshold: consecutive failures opening the circuit
+    :param reset_timeout: seconds the circuit stays open before a trial
+    """
+
+    def __init__(
+        self,
+        session=None,
+        pool_size=10,
+        timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+        retries=2,
+        backoff=0.5,
+        max_backoff=8,
+        failure_threshold=5,
+        reset_timeout=30,
+    ):
+        if session is None:
+            session = requests.Session()
+            # As many kept-alive connections as threads making requests
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+
+        self.session = session
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request("HEAD", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        """
+        Make the request, trying again if it's idempotent and fails for a
+        transient reason. The response of the last try is returned, even
+        with a retryable status.
+
+        raises requests.RequestException (CircuitOpenError while the API
+        is down)
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        retries = self.retries if method in _IDEMPOTENT_METHODS else 0
+
+        for attempt in range(retries + 1):
+            self._before_request(url)
+            try:
+                # session.get, head or post: their defaults (redirects) apply
+                response = getattr(self.session, method.lower())(url, **kwargs)
+            except requests.RequestException as error:
+                # Recorded whatever the error, or a trial would never end
+                self._record(success=False)
+                transient = isinstance(
+                    error, (requests.ConnectionError, requests.Timeout)
+                )
+                if not transient or attempt == retries:
+                    raise
+
+                logger.debug("%s raised requesting %s: %s", type(error), url, error)
+                delay = self._delay(attempt)
+            else:
+                retryable = response.status_code in RETRY_STATUSES
+                self._record(success=not retryable)
+                if not retryable or attempt == retries:
+                    return response
+
+                logger.debug("%s returned %d", url, response.status_code)
+                delay = self._delay(attempt, response.headers.get("Retry-After"))
+                response.close()
+
+            logger.info("Trying %s again in %.1f seconds", url, delay)
+            time.sleep(delay)
+
+    def _delay(self, attempt, retry_after=None):
+        try:
+            # Asked by the server (in seconds; HTTP dates are ignored)
+            return min(self.max_backoff, float(retry_after))
+        except (TypeError, ValueError):
+            return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+    def _before_request(self, url):
+        if self.failure_threshold is None:
+            return
+
+        with self._lock:
+            if self._opened_at is None:
+                return
+
+            if self._trial or time.monotonic() - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError(f"Qobuz API unavailable, not requesting {url}")
+
+            # Half-open: this request tells whether the API is back
+            self._trial = True
+
+    def _record(self, success):
+        if self.failure_threshold is None:
+            return
+
+        with self._lock:
+            self._trial = False
+            if success:
+                if self._opened_at is not None:
+                    logger.info("Qobuz API available again")
+                self._failures = 0
+                self._opened_at = None
+                return
+
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning(
+                        "Qobuz API unavailable: not requesting it for %d seconds",
+                        self.reset_timeout,
+                    )
+                self._opened_at = time.monotonic()
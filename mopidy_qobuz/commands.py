@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import time
+
+from mopidy import commands
+
+from mopidy_qobuz import backend
+from mopidy_qobuz import browse
+from mopidy_qobuz import client as qclient
+
+logger = logging.getLogger(__name__)
+
+
+class QobuzCommand(commands.Command):
+    def __init__(self):
+        super().__init__()
+        self.add_child("warm", WarmCommand())
+
+
+class WarmCommand(commands.Command):
+    help = "Resolve the custom library items ahead of time, to fill the cache."
+
+    def run(self, args, config):
+        qobuz_config = config["qobuz"]
+        cache = backend._get_cache(config)
+        if cache is None:
+            logger.error("The metadata cache is disabled (metadata_cache_size)")
+            return 1
+
+        client = qclient.Client(
+            qobuz_config["app_id"], qobuz_config["secret"], cache=cache
+        )
+        client.login(qobuz_config["username"], qobuz_config["password"])
+
+        start = time.monotonic()
+        count = 0
+        try:
+            for library in browse.browse("qobuz:custom", client, qobuz_config):
+                for section in browse.browse(library.uri, client, qobuz_config):
+                    refs = browse.browse(section.uri, client, qobuz_config)
+                    logger.info("%s: %d items", section.uri, len(refs))
+                    count += len(refs)
+        finally:
+            cache.close()
+
+        logger.info("Resolved %d items in %.1f s", count, time.monotonic() - start)
+        return 0
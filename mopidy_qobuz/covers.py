@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+
+import io
+import logging
+import pathlib
+import tempfile
+import threading
+
+import requests
+from tornado import ioloop
+from tornado import web
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional, Qobuz sizes are served without it
+    Image = None
+
+from mopidy_qobuz import Extension
+from mopidy_qobuz.images import IMAGE_SIZES
+
+logger = logging.getLogger(__name__)
+
+# Sizes served by the proxy, and its route (under the Mopidy HTTP server)
+COVER_SIZES = (64, 150, 300, 600)
+ROUTE = "/qobuz/covers"
+
+_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(config):
+    "Return the cover store shared by the backend and the HTTP handlers"
+    path = Extension.get_cache_dir(config) / "covers"
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = CoverStore(path)
+        return _stores[path]
+
+
+def cover_uri(album_id, size):
+    return f"{ROUTE}/{size}/{album_id}.jpg"
+
+
+class CoverStore:
+    """On-disk store of album covers, resized to COVER_SIZES.
+
+    Sources (the Qobuz image dict of an album) are registered when images
+    are looked up. A cover is downloaded the first time it's requested;
+    stored files are served even without a source, so offline too.
+    Without Pillow, each size is the smallest Qobuz size covering it.
+    """
+
+    def __init__(self, path, session=None):
+        self.path = pathlib.Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._session = session or requests.Session()
+        self._sources = {}
+        self._lock = threading.Lock()
+
+    def register(self, album_id, image):
+        with self._lock:
+            self._sources[str(album_id)] = image
+
+    def get(self, album_id, size):
+        "Return the path of the cover, downloading it if needed, or None"
+        album_id, size = str(album_id), int(size)
+        if size not in COVER_SIZES:
+            return None
+
+        file = self.path / str(size) / f"{album_id}.jpg"
+        if file.exists():
+            return file
+
+        with self._lock:
+            image = self._sources.get(album_id)
+
+        if not image:
+            logger.debug("No known source for the cover of %s", album_id)
+            return None
+
+        try:
+            content = self._fetch(album_id, image, size)
+        except Exception as error:
+            logger.warning("Couldn't fetch the cover of %s: %s", album_id, error)
+            return None
+
+        if content is None:
+            return None
+
+        _write(file, content)
+        return file
+
+    def _fetch(self, album_id, image, size):
+        if Image is None:
+            url = _source_url(image, size)
+            return None if url is None else self._download(url)
+
+        original = self.path / "original" / f"{album_id}.jpg"
+        if not original.exists():
+            url = image.get("large") or _source_url(image, size)
+            if url is None:
+                return None
+            _write(original, self._download(url))
+
+        return _resize(original, size)
+
+    def _download(self, url):
+        response = self._session.get(url, timeout=10)
+        response.raise_for_status()
+        return response.content
+
+
+class CoverHandler(web.RequestHandler):
+    def initialize(self, store):
+        self._store = store
+
+    async def get(self, size, album_id):
+        file = await ioloop.IOLoop.current().run_in_executor(
+            None, self._store.get, album_id, size
+        )
+        if file is None:
+            raise web.HTTPError(404)
+
+        self.set_header("Content-Type", "image/jpeg")
+        self.set_header("Cache-Control", _CACHE_CONTROL)
+        self.write(file.read_bytes())
+
+
+def factory(config, core):
+    return [(r"/covers/(\d+)/(\w+)\.jpg", CoverHandler, {"store": get_store(config)})]
+
+
+def _source_url(image, size):
+    "Smallest Qobuz size covering the requested one (or the largest one)"
+    urls = [(qobuz_size, image.get(key)) for key, qobuz_size in IMAGE_SIZES]
+    urls = [(qobuz_size, url) for qobuz_size, url in urls if url]
+    for qobuz_size, url in urls:
+        if qobuz_size >= size:
+            return url
+
+    return urls[-1][1] if urls else None
+
+
+def _resize(original, size):
+    with Image.open(original) as image:
+        image = image.convert("RGB")
+        image.thumbnail((size, size))
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=90)
+
+    return buffer.getvalue()
+
+
+def _write(file, content):
+    file.parent.mkdir(parents=True, exist_ok=True)
+    # Unique: the same cover may be written by concurrent requests
+    with tempfile.NamedTemporaryFile(
+        dir=file.parent, suffix=".part", delete=False
+    ) as part:
+        part.write(content)
+
+    part = pathlib.Path(part.name)
+    try:
+        part.replace(file)
+    except OSError:
+        part.unlink(missing_ok=True)
+        raise
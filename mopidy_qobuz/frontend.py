@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from mopidy import core
+import pykka
+
+logger = logging.getLogger(__name__)
+
+
+class QobuzFrontend(pykka.ThreadingActor, core.CoreListener):
+    """Watches the tracklist and asks the backend to resolve the stream URLs
+    of the upcoming Qobuz tracks before playback gets to them."""
+
+    def __init__(self, config, core):
+        super().__init__()
+        self._core = core
+        self._prefetch_count = config["qobuz"]["prefetch_count"]
+
+    def track_playback_started(self, tl_track):
+        self._prefetch()
+
+    def tracklist_changed(self):
+        self._prefetch()
+
+    def _prefetch(self):
+        if not self._prefetch_count:
+            return
+
+        uris = self._upcoming_uris()
+        if not uris:
+            return
+
+        backend = _get_backend()
+        if backend is None:
+            logger.debug("Qobuz backend not running")
+            return
+
+        logger.debug("Prefetching %s", uris)
+        backend.playback.prefetch(uris)
+
+    def _upcoming_uris(self):
+        tracklist = self._core.tracklist
+        tl_tracks = tracklist.get_tl_tracks().get()
+        index = tracklist.index().get()
+        start = 0 if index is None else index + 1
+
+        uris = []
+        for tl_track in tl_tracks[start:]:
+            if len(uris) >= self._prefetch_count:
+                break
+
+            if tl_track.track.uri.startswith("qobuz:track:"):
+                uris.append(tl_track.track.uri)
+
+        return uris
+
+
+def _get_backend():
+    from mopidy_qobuz.backend import QobuzBackend
+
+    refs = pykka.ActorRegistry.get_by_class(QobuzBackend)
+    return refs[0].proxy() if refs else None
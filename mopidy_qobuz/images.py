@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import json
+import logging
+import sqlite3
+import threading
+
+from mopidy_qobuz.client import Album
+from mopidy_qobuz.client import Track
+
+logger = logging.getLogger(__name__)
+
+# Image keys of the Qobuz payloads and their dimensions
+IMAGE_SIZES = (("thumbnail", 50), ("small", 230), ("large", 600))
+
+_FLUSH_SIZE = 500
+# Albums and tracks kept in memory each, the least recently used forgotten
+_REMEMBERED = 10_000
+
+
+class ImageIndex:
+    """Persistent index of album images, and of the album of every track.
+
+    It is filled by observing the entities built by a client, so covers of
+    anything already seen in a payload are known without further requests.
+    Writes are buffered and stored in batches. The most recently used
+    entries are kept in memory; misses aren't, as the items may be seen
+    later.
+    """
+
+    def __init__(self, path=None):
+        self._albums = collections.OrderedDict()
+        self._tracks = collections.OrderedDict()
+        self._pending_albums = {}
+        self._pending_tracks = {}
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(
+            ":memory:" if path is None else str(path), check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS albums (id TEXT PRIMARY KEY, image TEXT)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tracks (id TEXT PRIMARY KEY, album_id TEXT)"
+        )
+        self._conn.commit()
+
+    def observe(self, item):
+        "Identity map observer"
+        if isinstance(item, Album) and item._image:
+            self.add_album(item.id, item._image)
+        elif isinstance(item, Track) and item.album is not None:
+            self.add_track(item.id, item.album.id)
+
+    def observe_raw(self, cls, data):
+        "Identity map raw observer"
+        album = data.get("album")
+        if cls is Track and album is not None:
+            if album.get("image"):
+                self.add_album(album["id"], album["image"])
+            self.add_track(data["id"], album["id"])
+
+    def add_album(self, album_id, image):
+        album_id = str(album_id)
+        with self._lock:
+            if self._albums.get(album_id) == image:
+                return
+
+            _remember(self._albums, album_id, image)
+            self._pending_albums[album_id] = image
+            self._flush_if_needed()
+
+    def add_track(self, track_id, album_id):
+        track_id, album_id = str(track_id), str(album_id)
+        with self._lock:
+            if self._tracks.get(track_id) == album_id:
+                return
+
+            _remember(self._tracks, track_id, album_id)
+            self._pending_tracks[track_id] = album_id
+            self._flush_if_needed()
+
+    def album_image(self, album_id):
+        "Return the image dict (small, thumbnail, large) of the album, or None"
+        album_id = str(album_id)
+        with self._lock:
+            image = self._albums.get(album_id) or self._pending_albums.get(album_id)
+            if image is None:
+                row = self._conn.execute(
+                    "SELECT image FROM albums WHERE id = ?", (album_id,)
+                ).fetchone()
+                if row is None:
+                    return None
+
+                image = json.loads(row[0])
+
+            _remember(self._albums, album_id, image)
+            return image
+
+    def track_album(self, track_id):
+        "Return the album ID of the track, or None"
+        track_id = str(track_id)
+        with self._lock:
+            album_id = self._tracks.get(track_id) or self._pending_tracks.get(track_id)
+            if album_id is None:
+                row = self._conn.execute(
+                    "SELECT album_id FROM tracks WHERE id = ?", (track_id,)
+                ).fetchone()
+                if row is None:
+                    return None
+
+                album_id = row[0]
+
+            _remember(self._tracks, track_id, album_id)
+            return album_id
+
+    def track_image(self, track_id):
+        album_id = self.track_album(track_id)
+        return None if album_id is None else self.album_image(album_id)
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+    def _flush_if_needed(self):
+        if len(self._pending_albums) + len(self._pending_tracks) >= _FLUSH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending_albums and not self._pending_tracks:
+            return
+
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO albums VALUES (?, ?)",
+            [(id, json.dumps(image)) for id, image in self._pending_albums.items()],
+        )
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO tracks VALUES (?, ?)",
+            list(self._pending_tracks.items()),
+        )
+        self._conn.commit()
+        logger.debug(
+            "Stored %d album images and %d tracks",
+            len(self._pending_albums),
+            len(self._pending_tracks),
+        )
+        self._pending_albums.clear()
+        self._pending_tracks.clear()
+
+
+def _remember(items, key, value):
+    "Set the value in the LRU map, forgetting the least recently used beyond"
+    items[key] = value
+    items.move_to_end(key)
+    if len(items) > _REMEMBERED:
+        items.popitem(last=False)
@@ -1,21 +1,40 @@
 # -*- coding: utf-8 -*-
 
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import json
 import logging
 import urllib.parse
 
 from mopidy import backend
 from mopidy import models
 
+from mopidy_qobuz import covers
 from mopidy_qobuz import translators
 from mopidy_qobuz.browse import browse
+from mopidy_qobuz.browse import BrowseCache
 from mopidy_qobuz.browse import ROOT_DIR
 from mopidy_qobuz.client import Album
 from mopidy_qobuz.client import Artist
 from mopidy_qobuz.client import Playlist
 from mopidy_qobuz.client import Track
+from mopidy_qobuz.client import TTLCache
+from mopidy_qobuz.covers import COVER_SIZES
+from mopidy_qobuz.images import IMAGE_SIZES
 
 logger = logging.getLogger(__name__)
 
+# Seconds a search result is reused for the same query
+_SEARCH_TTL = 5 * 60
+
+# Albums looked up lately are kept, and their tracks with them, for the
+# lookups of their tracks that follow (Mopidy looks up one URI at a time)
+_RECENT_ALBUMS = 32
+_RECENT_ALBUMS_TTL = 10 * 60
+
+# Seconds the tracks of an artist lookup are kept in the client's cache
+_ARTIST_LOOKUP_TTL = 24 * 60 * 60
+
 
 class QobuzLibraryProvider(backend.LibraryProvider):
     root_directory = ROOT_DIR
@@ -23,17 +42,31 @@ class QobuzLibraryProvider(backend.LibraryProvider):
     def __init__(self, backend):
         self._backend = backend
         self._config = backend._config["qobuz"]
+        self._search_cache = TTLCache(_SEARCH_TTL)
+        self._recent_albums = TTLCache(_RECENT_ALBUMS_TTL, max_items=_RECENT_ALBUMS)
+        self._browse_cache = BrowseCache(backend._executor)
+        # Covers are served by our HTTP route, when Mopidy-HTTP is there
+        self._covers = None
+        http_enabled = backend._config.get("http", {}).get("enabled", False)
+        if self._config["cover_proxy"] and http_enabled:
+            self._covers = covers.get_store(backend._config)
 
     def get_distinct(self, field, query=None):
         logger.info("Browsing distinct %s with query %r", field, query)
-        return []
+        index = self._backend._search_index
+        if index is None:
+            return set()
+
+        return index.get_distinct(field, query)
 
     def browse(self, uri):
         # fixme
         if not uri or not uri.startswith("qobuz"):
             return []
 
-        return browse(uri, self._backend._client, self._config)
+        return browse(
+            uri, self._backend._client, self._config, cache=self._browse_cache
+        )
 
     def lookup(self, uris=None):
         if not uris:
@@ -44,34 +77,52 @@ class QobuzLibraryProvider(backend.LibraryProvider):
             uris = [uris]
 
         client = self._backend._client
-        tracks = []
+        executor = self._backend._executor
+
+        # Every URI is fetched once, whatever the number of occurrences
+        unique = {}
         for uri in uris:
             if not uri.startswith("qobuz:"):
                 continue
 
             type = uri.split(":")[1]
-            id = uri.split(":")[-1]
-
-            # TODO: add artist and playlist support
-            if type == "album":
-                album = Album.from_id(client, id)
-                tracks.extend([translators.to_track(track) for track in album.tracks])
+            if type not in _LOOKUP_TYPES:
+                logger.debug("Ignoring non-supported type: %s", type)
+                continue
 
-            elif type == "artist":
-                artist = Artist.from_id(client, id)
-                tracks.extend([translators.to_track(track) for track in artist.tracks])
+            unique.setdefault(uri, type)
+
+        containers = [uri for uri, type in unique.items() if type != "track"]
+        track_uris = [uri for uri, type in unique.items() if type == "track"]
+        found = dict(zip(containers, executor.map(self._lookup_container, containers)))
+
+        # Tracks of the containers of this batch are taken from their results.
+        # Those of the recent albums are still in the client's identity map,
+        # which only holds weak references.
+        batch = {
+            track.uri: track
+            for tracks in found.values()
+            for track in tracks
+            if track is not None
+        }
+        missing = []
+        for uri in track_uris:
+            if uri in batch:
+                found[uri] = [batch[uri]]
+                continue
 
-            elif type == "playlist":
-                playlist = Playlist.from_id(client, id)
-                tracks.extend(
-                    [translators.to_track(track) for track in playlist.tracks]
-                )
+            track = client.entities.get(Track, uri.split(":")[-1])
+            if track is not None:
+                found[uri] = [translators.to_track(track)]
+            else:
+                missing.append(uri)
 
-            elif type == "track":
-                tracks.append(translators.to_track(Track.from_id(client, id)))
+        logger.debug("Fetching %d of %d tracks", len(missing), len(unique))
+        found.update(zip(missing, executor.map(self._lookup_track, missing)))
 
-            else:
-                logger.debug("Ignoring non-supported type: %s", type)
+        tracks = []
+        for uri in uris:
+            tracks.extend(found.get(uri, []))
 
         return _filter_none(tracks)
 
@@ -91,8 +142,11 @@ class QobuzLibraryProvider(backend.LibraryProvider):
             else:
                 return None
         else:
+            fields = query
             # For qobuz API, which is smart enough
-            query = " ".join(" ".join(value) for value in query.values()).strip()
+            query = " ".join(" ".join(value) for value in query.values())
+            # Whitespace is collapsed, so that equivalent queries share the cache
+            query = " ".join(query.split())
             if not query:
                 logger.debug("Query is empty: %s", query)
                 return None
@@ -100,11 +154,52 @@ class QobuzLibraryProvider(backend.LibraryProvider):
             uri = f"qobuz:search:{urllib.parse.quote(query)}"
             logger.debug("Generated uri: %s", uri)
 
-            albums = self._search(translators.to_album, Album, "search_album_count", query)
-            artists = self._search(
-                translators.to_artist, Artist, "search_artist_count", query
+            # The API has no exact search: those are answered locally only
+            index = self._backend._search_index
+            if index is not None and (exact or not self._config["search_remote"]):
+                local = index.search(fields, exact)
+                return models.SearchResult(
+                    uri=uri,
+                    albums=local["album"],
+                    artists=local["artist"],
+                    tracks=local["track"],
+                )
+
+            key = (
+                query.lower(),
+                self._config["search_album_count"],
+                self._config["search_artist_count"],
+                self._config["search_track_count"],
+            )
+            result = self._search_cache.get(key)
+            if result is not None:
+                logger.debug("Search cache hit: %s", query)
+                return result
+
+            executor = self._backend._executor
+            albums = executor.submit(
+                self._search, translators.to_album, Album, "search_album_count", query
+            )
+            artists = executor.submit(
+                self._search,
+                translators.to_artist,
+                Artist,
+                "search_artist_count",
+                query,
+            )
+            tracks = executor.submit(
+                self._search, translators.to_track, Track, "search_track_count", query
+            )
+
+            local = index.search(fields) if index is not None else {}
+            result = models.SearchResult(
+                uri=uri,
+                albums=self._merge(albums.result(), local, "album"),
+                artists=self._merge(artists.result(), local, "artist"),
+                tracks=self._merge(tracks.result(), local, "track"),
             )
-            tracks = self._search(translators.to_track, Track, "search_track_count", query)
+            self._search_cache.set(key, result)
+            return result
 
         return models.SearchResult(
             uri=uri,
@@ -118,32 +213,103 @@ class QobuzLibraryProvider(backend.LibraryProvider):
         if not uris:
             return {}
 
-        client = self._backend._client
-        images = {}
+        index = self._backend._image_index
+        executor = self._backend._executor
 
-        for uri in uris:
-            type = uri.split(":")[1]
-            id = uri.split(":")[-1]
+        uris = [uri for uri in uris if uri.split(":")[1] in ("album", "track")]
 
-            if type not in ("album", "track"):
-                continue
-
-            image = None
-            if type == "album":
-                album = Album.from_id(client, id)
-                image = album.image()
-            elif type == "track":
-                track = Track.from_id(client, id)
-                image = track.album.image()
+        # Covers are read from the index, filled by every payload seen so
+        # far. The missing items are fetched concurrently, which fills it.
+        missing = [uri for uri in uris if _indexed_image(index, uri) is None]
+        logger.debug("Fetching images of %d of %d items", len(missing), len(uris))
+        list(executor.map(self._fetch_image_item, missing))
 
-            if image is not None:
-                images[uri] = [models.Image(uri=image, width=600, height=600)]
-            else:
+        images = {}
+        for uri in uris:
+            image = _indexed_image(index, uri)
+            if not image:
                 images[uri] = ()
+            elif self._covers is not None:
+                album_id = _album_id(index, uri)
+                self._covers.register(album_id, image)
+                images[uri] = _to_cover_images(album_id)
+            else:
+                images[uri] = _to_images(image)
 
         logger.info("Returning images: %s", images)
         return images
 
+    def _lookup_container(self, uri):
+        cls = _LOOKUP_TYPES[uri.split(":")[1]]
+        try:
+            if cls is Artist:
+                return self._lookup_artist(uri.split(":")[-1])
+
+            container = cls.from_id(self._backend._client, uri.split(":")[-1])
+            if cls is Album:
+                self._recent_albums.set(container.id, container)
+            elif cls is Playlist:
+                # Playlists can be long: translated from the raw payloads
+                return translators.to_tracks(container.get_track_items())
+
+            return [translators.to_track(track) for track in container.tracks]
+        except Exception as error:
+            logger.warning("%s raised looking up %s: %s", type(error), uri, error)
+            return []
+
+    def _lookup_artist(self, artist_id):
+        """Return the first tracks of an artist, up to artist_lookup_count, in
+        the artist_lookup_order. They're kept in the client's cache."""
+        client = self._backend._client
+        count = self._config["artist_lookup_count"] or None
+        order = self._config["artist_lookup_order"]
+
+        key = f"artist-lookup:{artist_id}:{order}:{count}"
+        if client.cache is not None:
+            value = client.cache.get(key)
+            if value is not None:
+                return json.loads(value, object_hook=models.model_json_decoder)
+
+        artist = Artist.from_data(client, {"id": artist_id})
+        if order == "releases":
+            tracks = _newest_tracks(client, artist)
+        else:
+            # The pages are fetched as the tracks are taken
+            tracks = artist.iter_tracks()
+
+        translated = (translators.to_track(track) for track in tracks)
+        tracks = list(itertools.islice(filter(None, translated), count))
+
+        if tracks and client.cache is not None:
+            value = json.dumps(tracks, cls=models.ModelJSONEncoder).encode()
+            client.cache.set(key, value, _ARTIST_LOOKUP_TTL)
+
+        return tracks
+
+    def _lookup_track(self, uri):
+        try:
+            track = Track.from_id(self._backend._client, uri.split(":")[-1])
+            return [translators.to_track(track)]
+        except Exception as error:
+            logger.warning("%s raised looking up %s: %s", type(error), uri, error)
+            return []
+
+    def _fetch_image_item(self, uri):
+        cls = _LOOKUP_TYPES[uri.split(":")[1]]
+        try:
+            cls.from_id(self._backend._client, uri.split(":")[-1])
+        except Exception as error:
+            logger.warning(
+                "%s raised fetching image of %s: %s", type(error), uri, error
+            )
+
+    def _merge(self, remote, local, kind):
+        "Append the local results missing from the remote ones, up to the count"
+        count = self._config[f"search_{kind}_count"]
+        uris = {item.uri for item in remote}
+        extra = [item for item in local.get(kind, []) if item.uri not in uris]
+        return remote + extra[: max(0, count - len(remote))]
+
     def _search(self, item_translator, item_cls, config_key, query):
         config_value = self._config[config_key]
 
@@ -157,6 +323,60 @@ class QobuzLibraryProvider(backend.LibraryProvider):
         return _filter_none(items)
 
 
+_LOOKUP_TYPES = {
+    "album": Album,
+    "artist": Artist,
+    "playlist": Playlist,
+    "track": Track,
+}
+
+
+def _indexed_image(index, uri):
+    if uri.split(":")[1] == "album":
+        return index.album_image(uri.split(":")[-1])
+
+    return index.track_image(uri.split(":")[-1])
+
+
+def _album_id(index, uri):
+    if uri.split(":")[1] == "album":
+        return uri.split(":")[-1]
+
+    return index.track_album(uri.split(":")[-1])
+
+
+def _to_cover_images(album_id):
+    return [
+        models.Image(uri=covers.cover_uri(album_id, size), width=size, height=size)
+        for size in COVER_SIZES
+    ]
+
+
+def _to_images(image):
+    return [
+        models.Image(uri=image[key], width=size, height=size)
+        for key, size in IMAGE_SIZES
+        if image.get(key)
+    ]
+
+
+def _newest_tracks(client, artist):
+    "Yield the tracks of the artist's albums, the newest albums first"
+    albums = sorted(
+        (album for album in artist.iter_albums() if album.streamable),
+        key=lambda album: album.release_date_original or "",
+        reverse=True,
+    )
+
+    # A few albums at a time: the next ones are only fetched if needed
+    size = client.max_workers
+    with ThreadPoolExecutor(max_workers=size) as executor:
+        for start in range(0, len(albums), size):
+            batch = albums[start : start + size]
+            for tracks in executor.map(lambda album: album.tracks, batch):
+                yield from tracks
+
+
 def _filter_none(items):
     # Translator return None if something fails
     return [item for item in items if item is not None]
@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 
+import heapq
 import logging
+import threading
+import time
 
 from mopidy import backend
 
@@ -8,41 +11,102 @@ from mopidy_qobuz.client import DownloadableTrack
 
 logger = logging.getLogger(__name__)
 
+_MAX_TRACKS = 200
+# URLs this close (in seconds) to their expiry are not handed out anymore
+_EXPIRY_MARGIN = 60
+# Queued tracks get a new URL this long before the old one expires
+_REFRESH_LEAD = 5 * 60
+_MIN_REFRESH_DELAY = 10
+# Queued tracks whose URL couldn't be resolved are tried again after this
+_RETRY_DELAY = 60
+
+
+class StreamUrlCache:
+    """Bounded cache of DownloadableTracks keyed by (track ID, format ID).
+
+    Entries are ordered by the expiry of their URL: expired ones are evicted
+    on every access, and the ones expiring soonest make room when full.
+    """
+
+    def __init__(self, max_size=_MAX_TRACKS, margin=_EXPIRY_MARGIN):
+        self.max_size = max_size
+        self.margin = margin
+        self._items = {}
+        self._heap = []
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            self._evict(time.time())
+            return self._items.get(key)
+
+    def put(self, key, downloadable):
+        expires = self.expires_at(downloadable)
+        with self._lock:
+            self._evict(time.time())
+            if expires is None or expires <= time.time():
+                logger.debug("Not caching expired URL: %s", downloadable)
+                return
+
+            self._items[key] = downloadable
+            heapq.heappush(self._heap, (expires, key))
+
+            while len(self._items) > self.max_size:
+                self._pop()
+
+    def expires_at(self, downloadable):
+        "Timestamp after which the URL is not handed out anymore."
+        if downloadable is None or downloadable.etsp is None:
+            return None
+
+        return downloadable.etsp.timestamp() - self.margin
+
+    def _evict(self, now):
+        while self._heap and self._heap[0][0] <= now:
+            self._pop()
+
+    def _pop(self):
+        expires, key = heapq.heappop(self._heap)
+        # Entries replaced by a newer URL leave stale heap items behind
+        if self.expires_at(self._items.get(key)) == expires:
+            del self._items[key]
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return len(self._items)
+
 
 class QobuzPlaybackProvider(backend.PlaybackProvider):
     def __init__(self, audio, backend):
         super().__init__(audio, backend)
         self._format_id = self.backend._config["qobuz"]["quality"]
-        self._tracks = {}
+        self._tracks = StreamUrlCache()
+        self._pending = {}
+        self._queued = []
+        self._failed = set()
+        self._refresh_timer = None
+        self._lock = threading.Lock()
 
     def translate_uri(self, uri):
         if not uri:
             return None
 
-        client = self.backend._client
         track_id = uri.split(":")[-1]
 
         logger.debug("Track ID: %s", track_id)
-        downloadable = None
-
-        if track_id in self._tracks and not self._tracks[track_id].is_expired():
-            downloadable = self._tracks[track_id]
-        else:
-            for _ in range(3):
-                try:
-                    downloadable = DownloadableTrack.from_id(
-                        client, track_id, format_id=self._format_id
-                    )
-                except Exception as error:
-                    logger.warning(
-                        "%s raised getting URL for %s. Trying again...",
-                        type(error),
-                        uri,
-                    )
-                    continue
-                else:
-                    self._tracks[track_id] = downloadable
-                    break
+
+        audio_cache = self.backend._audio_cache
+        if audio_cache is not None:
+            file = audio_cache.get(track_id, self._format_id)
+            if file is not None:
+                logger.info("Playing cached file: %s", file)
+                return file.as_uri()
+
+        downloadable = self._tracks.get(self._key(track_id))
+        if downloadable is None:
+            downloadable = self.resolve(track_id).result()
 
             if not downloadable:
                 logger.warning("Couldn't get DownloadableTrack")
@@ -57,4 +121,105 @@ class QobuzPlaybackProvider(backend.PlaybackProvider):
 
         logger.info("Valid track found: %s", downloadable)
 
+        if audio_cache is not None:
+            audio_cache.fill(downloadable, self._format_id)
+
         return downloadable.url
+
+    def prefetch(self, uris):
+        """
+        Start resolving the stream URLs of the tracks in the background, so
+        that translate_uri finds them cached. Their URLs are refreshed before
+        they expire until the next call.
+        """
+        self._queued = [uri.split(":")[-1] for uri in uris]
+        for track_id in self._queued:
+            if self._key(track_id) not in self._tracks:
+                self.resolve(track_id)
+
+        self._schedule_refresh()
+
+    def resolve(self, track_id):
+        """
+        Resolve the DownloadableTrack in the playback lane of the backend.
+        Concurrent calls for the same track share the request.
+
+        :returns: Future resolving to the DownloadableTrack, or None
+        """
+        with self._lock:
+            future = self._pending.get(track_id)
+            if future is None:
+                future = self.backend._playback_executor.submit(self._fetch, track_id)
+                self._pending[track_id] = future
+                future.add_done_callback(lambda _: self._pending.pop(track_id, None))
+
+        return future
+
+    def _fetch(self, track_id):
+        # Transient failures are already tried again by the client's transport
+        try:
+            downloadable = DownloadableTrack.from_id(
+                self.backend._client, track_id, format_id=self._format_id
+            )
+        except Exception as error:
+            logger.warning(
+                "%s raised getting URL for %s: %s", type(error), track_id, error
+            )
+            self._failed.add(track_id)
+            if track_id in self._queued:
+                # Keeps the refresh going: the track is tried again later
+                self._schedule_refresh()
+            return None
+
+        self._failed.discard(track_id)
+        self._tracks.put(self._key(track_id), downloadable)
+        if track_id in self._queued:
+            self._schedule_refresh()
+        return downloadable
+
+    def _schedule_refresh(self):
+        # A single timer, set for the queued URL that expires first. The state
+        # is read under the lock, so the last call sees every URL stored
+        # before it, and its timer is the one kept.
+        with self._lock:
+            self._cancel_refresh()
+
+            now = time.time()
+            delays = []
+            for track_id in self._queued:
+                expires = self._tracks.expires_at(self._tracks.get(self._key(track_id)))
+                if expires is not None:
+                    delays.append(expires - _REFRESH_LEAD - now)
+                elif track_id in self._failed:
+                    delays.append(_RETRY_DELAY)
+
+            if not delays:
+                return
+
+            # Never spin if the API keeps returning URLs close to expiry
+            delay = max(_MIN_REFRESH_DELAY, min(delays))
+            logger.debug("Refreshing queued URLs in %d seconds", delay)
+            self._refresh_timer = threading.Timer(delay, self._refresh_queued)
+            self._refresh_timer.daemon = True
+            self._refresh_timer.start()
+
+    def _refresh_queued(self):
+        deadline = time.time() + _REFRESH_LEAD
+        for track_id in self._queued:
+            expires = self._tracks.expires_at(self._tracks.get(self._key(track_id)))
+            if expires is None or expires <= deadline:
+                logger.debug("Refreshing URL of queued track %s", track_id)
+                self.resolve(track_id)
+
+    def close(self):
+        "Cancel the scheduled refresh, when the backend stops"
+        with self._lock:
+            self._cancel_refresh()
+
+    def _cancel_refresh(self):
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+            self._refresh_timer = None
+
+    def _key(self, track_id):
+        return (str(track_id), self._format_id)
@@ -37,8 +37,9 @@ class QobuzPlaylistsProvider(backend.PlaylistsProvider):
         return playlist
 
     def refresh(self):
-        # TODO
-        pass
+        client = self._backend._client
+        if client is not None and client.mirror is not None:
+            client.mirror.sync_playlists(client)
 
     def create(self):
         # Apparently possible with Qobuz API. TODO.
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import sqlite3
+import threading
+
+from mopidy import models
+
+from mopidy_qobuz import translators
+from mopidy_qobuz.client import Album
+from mopidy_qobuz.client import Artist
+from mopidy_qobuz.client import Track
+
+logger = logging.getLogger(__name__)
+
+# Columns of the index, by Mopidy query field
+FIELDS = {
+    "track_name": "track",
+    "album": "album",
+    "artist": "artist",
+    "performer": "artist",
+    "albumartist": "albumartist",
+    "composer": "composer",
+    "date": "date",
+}
+
+_COLUMNS = ("track", "album", "artist", "albumartist", "composer", "date")
+
+_FLUSH_SIZE = 500
+# Entries kept; the ones indexed the longest ago are pruned beyond it
+_MAX_ENTRIES = 100_000
+_LOW_WATER = 0.9
+
+
+class SearchIndex:
+    """Full-text index (SQLite FTS5) of the artists, albums and tracks seen.
+
+    Like ImageIndex, it observes the entities built by a client. Entities
+    are translated and stored in batches, by a writer thread so observers
+    (building entities) never wait for SQLite; searches store what's
+    pending first. Every entry keeps its Mopidy model, so results are
+    returned without fetching anything. Beyond max_entries, the entries
+    indexed the longest ago are pruned.
+    """
+
+    def __init__(self, path=None, max_entries=_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._pending = {}
+        # _lock guards the pending entities, _write_lock the connection
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+
+        self._conn = sqlite3.connect(
+            ":memory:" if path is None else str(path), check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "id INTEGER PRIMARY KEY, uri TEXT UNIQUE, kind TEXT, "
+            "track TEXT COLLATE NOCASE, album TEXT COLLATE NOCASE, "
+            "artist TEXT COLLATE NOCASE, albumartist TEXT COLLATE NOCASE, "
+            "composer TEXT COLLATE NOCASE, date TEXT, model TEXT);"
+            "CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5("
+            "track, album, artist, albumartist, composer, date);"
+        )
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+        self._writer = threading.Thread(
+            target=self._write_loop, name="QobuzSearchIndex", daemon=True
+        )
+        self._writer.start()
+
+    def observe(self, item):
+        "Identity map observer"
+        if isinstance(item, (Album, Artist, Track)) and _is_named(item):
+            with self._lock:
+                self._pending[item.uri] = item
+                if len(self._pending) >= _FLUSH_SIZE:
+                    self._wake.set()
+
+    def observe_raw(self, cls, data):
+        "Identity map raw observer: track payloads are indexed like entities"
+        if cls is Track:
+            with self._lock:
+                self._pending[f"qobuz:track:{data['id']}"] = data
+                if len(self._pending) >= _FLUSH_SIZE:
+                    self._wake.set()
+
+    def search(self, query, exact=False, limit=100):
+        """Return the artists, albums and tracks matching a Mopidy query, as
+        a dict of model lists by kind. Unsupported fields match nothing."""
+        if exact:
+            where = _exact_where(query)
+            if where is None:
+                return _empty_results()
+
+            sql = f"SELECT kind, model FROM entries WHERE {where[0]}"
+            params = where[1]
+        else:
+            match = _fts_match(query)
+            if match is None:
+                return _empty_results()
+
+            sql = (
+                "SELECT kind, model FROM entries_fts JOIN entries "
+                "ON entries.id = entries_fts.rowid "
+                "WHERE entries_fts MATCH ? ORDER BY rank"
+            )
+            params = (match,)
+
+        results = _empty_results()
+        with self._write_lock:
+            self._flush()
+            for kind, model in self._conn.execute(sql, params):
+                if len(results[kind]) < limit:
+                    results[kind].append(
+                        json.loads(model, object_hook=models.model_json_decoder)
+                    )
+
+        return results
+
+    def get_distinct(self, field, query=None):
+        "Return the set of the values of a field, in the entries matching query"
+        try:
+            column = FIELDS[field]
+        except KeyError:
+            return set()
+
+        where = _exact_where(query or {})
+        if where is None:
+            return set()
+
+        sql = (
+            f"SELECT DISTINCT {column} FROM entries "
+            f"WHERE {column} IS NOT NULL AND {where[0]}"
+        )
+        params = where[1]
+
+        with self._write_lock:
+            self._flush()
+            return {row[0] for row in self._conn.execute(sql, params)}
+
+    def flush(self):
+        with self._write_lock:
+            self._flush()
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self._writer.join()
+        with self._write_lock:
+            self._flush()
+            self._conn.close()
+
+    def _write_loop(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            if self._closed:
+                return
+
+            try:
+                self.flush()
+            except Exception as error:
+                logger.warning("%s raised indexing: %s", type(error), error)
+
+    def _flush(self):
+        "Store the pending entities; called holding the write lock"
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+
+        if not pending:
+            return
+
+        entries = []
+        for item in pending:
+            if isinstance(item, dict):
+                entries.extend(_raw_entries(item))
+            else:
+                entries.append(_to_entry(item))
+
+        for entry in entries:
+            if entry is None:
+                continue
+
+            uri, kind, values, model = entry
+            row = self._conn.execute(
+                "SELECT id FROM entries WHERE uri = ?", (uri,)
+            ).fetchone()
+            if row is not None:
+                self._conn.execute("DELETE FROM entries_fts WHERE rowid = ?", row)
+                self._conn.execute("DELETE FROM entries WHERE id = ?", row)
+            else:
+                self._count += 1
+
+            id = self._conn.execute(
+                "INSERT INTO entries (uri, kind, track, album, artist, albumartist, "
+                "composer, date, model) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (uri, kind, *values, model),
+            ).lastrowid
+            self._conn.execute(
+                "INSERT INTO entries_fts (rowid, track, album, artist, albumartist, "
+                "composer, date) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (id, *values),
+            )
+
+        if self._count > self.max_entries:
+            self._prune()
+
+        self._conn.commit()
+        logger.debug("Indexed %d entries", len(entries))
+
+    def _prune(self):
+        "Remove the entries indexed the longest ago, down to the low-water mark"
+        excess = self._count - int(self.max_entries * _LOW_WATER)
+        row = self._conn.execute(
+            "SELECT id FROM entries ORDER BY id LIMIT 1 OFFSET ?", (excess - 1,)
+        ).fetchone()
+        if row is None:
+            return
+
+        # Reindexed entries get a new ID: the lowest were seen the longest ago
+        self._conn.execute("DELETE FROM entries_fts WHERE rowid <= ?", row)
+        self._conn.execute("DELETE FROM entries WHERE id <= ?", row)
+        self._count -= excess
+        logger.debug("Pruned %d entries of the search index", excess)
+
+
+def _empty_results():
+    return {"artist": [], "album": [], "track": []}
+
+
+def _is_named(item):
+    """Whether the payloads of the entity had its name: placeholders built
+    from an ID alone would replace the entry with an unknown one"""
+    return ("name" if isinstance(item, Artist) else "title") in item._keys
+
+
+def _to_entry(item):
+    "Return (uri, kind, column values, model JSON) of the item, or None"
+    try:
+        if isinstance(item, Track):
+            model = translators.to_track(item)
+            composer = item.composer.name if item.composer is not None else None
+            values = (
+                model.name,
+                model.album.name,
+                item.artist.name,
+                item.album.artist.name,
+                composer,
+                model.date,
+            )
+            kind = "track"
+        elif isinstance(item, Album):
+            model = translators.to_album(item)
+            artist = item.artist.name
+            values = (None, model.name, artist, artist, None, model.date)
+            kind = "album"
+        else:
+            model = translators.to_artist(item)
+            values = (None, None, model.name, None, None, None)
+            kind = "artist"
+    except AttributeError:  # Not streamable (translated to None), or partial
+        return None
+
+    if model is None or model.name is None:
+        return None
+
+    return item.uri, kind, values, _to_json(model)
+
+
+def _raw_entries(data):
+    "Return the entries of a raw track payload and of its album"
+    tracks = translators.to_tracks([data])
+    if not tracks:
+        return []
+
+    track = tracks[0]
+    album = track.album
+    album_artist = next(iter(album.artists)).name
+    composer = (data.get("composer") or {}).get("name")
+    values = (
+        track.name,
+        album.name,
+        next(iter(track.artists)).name,
+        album_artist,
+        composer,
+        track.date,
+    )
+    album_values = (None, album.name, album_artist, album_artist, None, album.date)
+    return [
+        (track.uri, "track", values, _to_json(track)),
+        (album.uri, "album", album_values, _to_json(album)),
+    ]
+
+
+def _to_json(model):
+    return json.dumps(model, cls=models.ModelJSONEncoder)
+
+
+def _columns(field):
+    if field == "any":
+        return _COLUMNS
+
+    return (FIELDS[field],) if field in FIELDS else None
+
+
+def _exact_where(query):
+    """Return the WHERE clause matching a Mopidy query exactly, and its
+    parameters, or None if a field isn't supported"""
+    clauses = []
+    params = []
+    for field, values in query.items():
+        columns = _columns(field)
+        if columns is None:
+            return None
+
+        for value in [values] if isinstance(values, str) else values:
+            clauses.append(" OR ".join(f"{column} = ?" for column in columns))
+            params.extend(value for _ in columns)
+
+    return " AND ".join(f"({clause})" for clause in clauses) or "1", params
+
+
+def _fts_match(query):
+    """Return the FTS5 query matching the words (or their prefixes) of a
+    Mopidy query, in the fields it names, or None"""
+    terms = []
+    for field, values in query.items():
+        columns = _columns(field)
+        if columns is None:
+            return None
+
+        for value in [values] if isinstance(values, str) else values:
+            tokens = " ".join(
+                '"{}"*'.format(token.replace('"', '""')) for token in value.split()
+            )
+            if tokens:
+                terms.append(f"{{{' '.join(columns)}}} : ({tokens})")
+
+    return " AND ".join(terms) or None
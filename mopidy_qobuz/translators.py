@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import functools
 import logging
 
 from mopidy import models
@@ -12,11 +13,20 @@ logger = logging.getLogger(__name__)
 
 _TRIVIAL_VERSIONS = ("album version", "lp version")
 
+# Artist and album models kept, so that the tracks of an album share them
+# instead of building (and validating) equal models again
+_INTERNED_MODELS = 4096
+
 # TODO: improve multiple artists priority
 
 
 def to_artist(artist: Artist):
-    return models.Artist(uri=artist.uri, name=artist.name)
+    return _artist_model(artist.uri, artist.name)
+
+
+@functools.lru_cache(maxsize=_INTERNED_MODELS)
+def _artist_model(uri, name):
+    return models.Artist(uri=uri, name=name)
 
 
 def to_artist_ref(artist):
@@ -27,12 +37,24 @@ def to_album(album: Album, hires_required=False):
     if not _is_item_available(album, hires_required):
         return None
 
+    return _album_model(
+        album.uri,
+        _complete_title(album),
+        album.artist.uri,
+        album.artist.name,
+        album.tracks_count,
+        album.release_date_original,
+    )
+
+
+@functools.lru_cache(maxsize=_INTERNED_MODELS)
+def _album_model(uri, name, artist_uri, artist_name, num_tracks, date):
     return models.Album(
-        uri=album.uri,
-        name=_complete_title(album),
-        artists=[to_artist(album.artist)],
-        num_tracks=album.tracks_count,
-        date=album.release_date_original,
+        uri=uri,
+        name=name,
+        artists=[_artist_model(artist_uri, artist_name)],
+        num_tracks=num_tracks,
+        date=date,
     )
 
 
@@ -90,10 +112,66 @@ def to_playlist_ref(playlist):
     return models.Ref.playlist(uri=playlist.uri, name=playlist.name)
 
 
+def to_tracks(items, album=None, hires_required=False):
+    """Translate raw track payloads (the items of a tracks page) straight
+    to Mopidy tracks, without building entities. Same rules as to_track.
+
+    :param album: payload of the album of the tracks, if they don't embed it
+    """
+    tracks = []
+    for item in items:
+        track = _raw_to_track(item, item.get("album", album), hires_required)
+        if track is not None:
+            tracks.append(track)
+
+    return tracks
+
+
+def _raw_to_track(item, album, hires_required):
+    if not item.get("streamable", False):
+        logger.info("Not streamable: track %s", item.get("id"))
+        return None
+
+    if hires_required and not item.get("hires_streamable", False):
+        return None
+
+    if album is None or album.get("artist") is None:
+        return None
+
+    # An album without the streamable key is as streamable as hi-res
+    if not album.get("streamable", album.get("hires_streamable", False)):
+        logger.info("Not streamable: album %s", album.get("id"))
+        return None
+
+    album_artist = album["artist"]
+    album_model = _album_model(
+        f"qobuz:album:{album['id']}",
+        _versioned_title(album.get("title", "Unknown"), album.get("version")),
+        f"qobuz:artist:{album_artist['id']}",
+        album_artist.get("name", "Unknown"),
+        album.get("tracks_count", 1),
+        album.get("release_date_original"),
+    )
+
+    artist = item.get("performer") or album_artist
+    return models.Track(
+        uri=f"qobuz:track:{item['id']}",
+        name=_track_title(
+            item.get("title"), item.get("version"), album.get("release_type")
+        ),
+        artists=[
+            _artist_model(f"qobuz:artist:{artist['id']}", artist.get("name", "Unknown"))
+        ],
+        album=album_model,
+        date=album_model.date,
+        length=item.get("duration", 0) * 1000,
+        disc_no=item.get("media_number", 1),
+        track_no=item.get("track_number", 1),
+    )
+
+
 def to_playlist(playlist):
-    tracks = [to_track(track) for track in playlist.tracks]
-    # See to_track()
-    tracks = [track for track in tracks if track is not None]
+    tracks = to_tracks(playlist.get_track_items())
     return models.Playlist(uri=playlist.uri, name=playlist.name, tracks=tracks)
 
 
@@ -124,23 +202,26 @@ def _track_ref_title(track):
 
 # Remove unwanted version extra strings from translated title
 def _track_complete_title(track):
-    release_type = track.album.release_type
-    if (
-        release_type is not None
-        and track.version is not None
-        and release_type in track.version
-    ):
-        return track.title
+    return _track_title(track.title, track.version, track.album.release_type)
+
+
+def _track_title(title, version, release_type):
+    if release_type is not None and version is not None and release_type in version:
+        return title
 
-    return _complete_title(track)
+    return _versioned_title(title, version)
 
 
 def _complete_title(item):
-    if item.version is not None and item.version.lower() not in _TRIVIAL_VERSIONS:
+    return _versioned_title(item.title, item.version)
+
+
+def _versioned_title(title, version):
+    if version is not None and version.lower() not in _TRIVIAL_VERSIONS:
         return (
-            f"{item.title.strip()} ({item.version.strip()})"
-            if item.version.lower() not in item.title.lower()
-            else item.title
+            f"{title.strip()} ({version.strip()})"
+            if version.lower() not in title.lower()
+            else title
         )
 
-    return item.title
+    return title
@@ -16,5 +16,13 @@ def qobuz_config():
             "search_album_count": 10,
             "search_track_count": 10,
             "search_artist_count": 0,
+            "metadata_cache_size": 64,
+            "prefetch_count": 1,
+            "audio_cache_size": 0,
+            "cover_proxy": True,
+            "library_mirror": True,
+            "search_remote": True,
+            "artist_lookup_count": 100,
+            "artist_lookup_order": "appearances",
         },
     }
@@ -0,0 +1,48 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+from mopidy_qobuz import client as qobuz_client
+from mopidy_qobuz.client import aio
+
+_ARTIST = {"id": 1, "name": "Kanye West"}
+
+
+@pytest.fixture
+def client():
+    return qobuz_client.Client("123", "abc", session=mock.Mock(headers={}))
+
+
+@pytest.fixture
+def async_client(client):
+    async_client_ = aio.AsyncClient(client)
+    yield async_client_
+    async_client_.close()
+
+
+def test_async_client_gathers_lookups(client, async_client):
+    response = mock.Mock()
+    response.json.side_effect = lambda: {"id": "foo", "title": "Foo", "artist": _ARTIST}
+    client.get = mock.Mock(return_value=response)
+
+    async def lookup():
+        return await asyncio.gather(
+            *[async_client.from_id(qobuz_client.Album, "foo") for _ in range(5)]
+        )
+
+    albums = asyncio.run(lookup())
+
+    assert client.get.call_count == 5
+    assert all(album is albums[0] for album in albums)
+
+
+def test_async_client_uses_the_library_mirror(client, async_client):
+    client.mirror = mock.Mock()
+    client.mirror.playlist.return_value = {"id": 1, "name": "Mine"}
+    client.get = mock.Mock()
+
+    playlist = asyncio.run(async_client.from_id(qobuz_client.Playlist, 1))
+
+    assert playlist.name == "Mine"
+    client.get.assert_not_called()
@@ -0,0 +1,57 @@
+from unittest import mock
+
+import pytest
+
+from mopidy_qobuz import audio_cache
+
+
+def _session(content):
+    response = mock.MagicMock()
+    response.__enter__.return_value = response
+    response.iter_content.return_value = [content]
+    return mock.Mock(**{"get.return_value": response})
+
+
+def _downloadable(id):
+    return mock.Mock(id=id, url=f"https://foo/{id}.flac", extension="FLAC")
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache_ = audio_cache.AudioCache(tmp_path, 10, _session(b"12345"))
+    yield cache_
+    cache_.close()
+
+
+def test_fill_and_get(cache):
+    assert cache.get(1, 6) is None
+
+    file = cache.fill(_downloadable(1), 6).result()
+
+    assert file.read_bytes() == b"12345"
+    assert file.name == "1_6.flac"
+    assert cache.get(1, 6) == file
+    assert cache.get(1, 27) is None
+
+
+def test_lru_eviction(cache):
+    for id in (1, 2):
+        cache.fill(_downloadable(id), 6).result()
+
+    cache.get(1, 6)
+    cache.fill(_downloadable(3), 6).result()
+
+    assert cache.get(2, 6) is None
+    assert cache.get(1, 6) is not None
+    assert cache.get(3, 6) is not None
+
+
+def test_scan_existing_files(tmp_path):
+    (tmp_path / "1_6.flac").write_bytes(b"12345")
+    (tmp_path / "2_6.part").write_bytes(b"12")
+
+    cache = audio_cache.AudioCache(tmp_path, 10, _session(b""))
+    cache.close()
+
+    assert cache.get(1, 6) == tmp_path / "1_6.flac"
+    assert not (tmp_path / "2_6.part").exists()
@@ -1,9 +1,13 @@
+import gc
 import os
+from unittest import mock
 
 import pytest
 
 from mopidy_qobuz import client as qobuz_client
 from mopidy_qobuz import browse
+from mopidy_qobuz import search_index
+from mopidy_qobuz.client import cache
 
 
 def test_read_yaml_folder():
@@ -81,3 +85,164 @@ def test_browse_custom_sub_items(client, config):
         )
         in result
     )
+
+
+class _Executor:
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        self.submitted.append((fn, args))
+
+
+def test_browse_cache_stale_while_revalidate(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(browse.time, "monotonic", lambda: now[0])
+    executor = _Executor()
+    cache = browse.BrowseCache(executor)
+    uri = "qobuz:featured:albums:tags:new-releases-full:genres:-1"
+
+    assert cache.get(uri, lambda: ["old"]) == ["old"]
+    assert cache.get(uri, lambda: ["new"]) == ["old"]
+    assert not executor.submitted
+
+    # Stale: served at once, and refreshed (once) in the background
+    now[0] += 7 * 60 * 60
+    assert cache.get(uri, lambda: ["new"]) == ["old"]
+    assert cache.get(uri, lambda: ["new"]) == ["old"]
+    assert len(executor.submitted) == 1
+    fn, args = executor.submitted[0]
+    fn(*args)
+    assert cache.get(uri, lambda: ["newer"]) == ["new"]
+
+    # Too old to be served
+    now[0] += 8 * 24 * 60 * 60
+    assert cache.get(uri, lambda: ["newest"]) == ["newest"]
+
+
+def test_browse_cache_skips_uncached_and_empty():
+    cache = browse.BrowseCache(_Executor())
+
+    assert cache.get("qobuz:custom:foo", lambda: ["a"]) == ["a"]
+    assert cache.get("qobuz:custom:foo", lambda: ["b"]) == ["b"]
+    assert cache.get("qobuz:album:1", lambda: []) == []
+    assert cache.get("qobuz:album:1", lambda: ["c"]) == ["c"]
+
+
+_ARTIST = {"id": 1, "name": "Kanye West"}
+
+
+def _favorites_get(endpoint, params):
+    items = [
+        {"id": str(id), "title": f"Album {id}", "artist": _ARTIST, "streamable": True}
+        for id in range(params["offset"], min(params["offset"] + params["limit"], 250))
+    ]
+    response = mock.Mock()
+    response.json.return_value = {"albums": {"items": items, "total": 250}}
+    return response
+
+
+def test_browse_favorites_pages():
+    client = qobuz_client.Client("123", "abc", session=mock.Mock(headers={}))
+    client.get = mock.Mock(side_effect=_favorites_get)
+
+    result = browse.browse("qobuz:favorites:albums", client)
+    assert [(ref.uri, ref.name) for ref in result] == [
+        ("qobuz:favorites:albums:page:1", "Page 1 (1-100)"),
+        ("qobuz:favorites:albums:page:2", "Page 2 (101-200)"),
+        ("qobuz:favorites:albums:page:3", "Page 3 (201-250)"),
+    ]
+
+    result = browse.browse("qobuz:favorites:albums:page:3", client)
+    assert [ref.uri for ref in result][:2] == ["qobuz:album:200", "qobuz:album:201"]
+    assert len(result) == 50
+    assert client.get.call_args.args[1]["offset"] == 200
+
+
+def test_browse_artist_keeps_its_indexed_name():
+    client = qobuz_client.Client("123", "abc", session=mock.Mock(headers={}))
+    index = search_index.SearchIndex()
+    client.entities.subscribe(index.observe)
+    qobuz_client.Artist.from_data(client, _ARTIST)
+    index.flush()
+    gc.collect()
+
+    # The artist is built again from its ID alone: a placeholder
+    response = mock.Mock()
+    response.json.return_value = {"id": 1, "albums": {"items": [], "total": 0}}
+    client.get = mock.Mock(return_value=response)
+    assert browse.browse("qobuz:artist:1", client) == []
+
+    assert index.get_distinct("artist") == {"Kanye West"}
+    assert index.search({"artist": ["kanye"]})["artist"]
+    index.close()
+
+
+def test_yaml_index_reads_changed_files(tmp_path, monkeypatch):
+    file = tmp_path / "library.yml"
+    file.write_text("title: Foo\nitems:\n  Bar:\n    - qobuz:album:1\n")
+    read = mock.Mock(side_effect=browse._read_yaml_folder)
+    monkeypatch.setattr(browse, "_read_yaml_folder", read)
+    config = {"custom_libraries": str(tmp_path)}
+
+    assert browse._get_yaml_items(config) == {"Foo": {"Bar": ["qobuz:album:1"]}}
+    assert browse._get_yaml_items(config) == {"Foo": {"Bar": ["qobuz:album:1"]}}
+    assert read.call_count == 1
+
+    file.write_text("title: Foo\nitems:\n  Baz:\n    - qobuz:album:2\n")
+    os.utime(file, ns=(0, 0))
+    assert browse._get_yaml_items(config) == {"Foo": {"Baz": ["qobuz:album:2"]}}
+    assert read.call_count == 2
+
+
+def test_custom_refs_cached(config):
+    client = qobuz_client.Client(
+        "123", "abc", session=mock.Mock(headers={}), cache=cache.MemoryCache()
+    )
+    response = mock.Mock()
+    response.json.return_value = {
+        "id": "0060253743926",
+        "title": "Yeezus",
+        "artist": _ARTIST,
+        "streamable": True,
+    }
+    client.get = mock.Mock(return_value=response)
+    uri = "qobuz:custom:Test list:2010s Hip Hop"
+
+    result = browse.browse(uri, client, config)
+    assert browse.browse(uri, client, config) == result
+    assert result == [
+        browse.models.Ref.album(
+            name="Kanye West - Yeezus", uri="qobuz:album:0060253743926"
+        )
+    ]
+    assert client.get.call_count == 1
+
+
+def test_resolve_custom_items_in_order():
+    client = qobuz_client.Client("123", "abc", session=mock.Mock(headers={}))
+
+    def get(endpoint, params):
+        id = params["album_id"]
+        if id == "2":
+            raise qobuz_client.NotFoundError
+
+        response = mock.Mock()
+        response.json.return_value = {
+            "id": id,
+            "title": f"Album {id}",
+            "artist": _ARTIST,
+            "streamable": True,
+        }
+        return response
+
+    client.get = mock.Mock(side_effect=get)
+    uris = [f"qobuz:album:{id}" for id in range(5)] + ["qobuz:label:1"]
+
+    result = browse._resolve_custom_items(client, uris)
+    assert [ref.uri for ref in result] == [
+        "qobuz:album:0",
+        "qobuz:album:1",
+        "qobuz:album:3",
+        "qobuz:album:4",
+    ]
@@ -0,0 +1,127 @@
+from unittest import mock
+
+import pytest
+
+from mopidy_qobuz import client as qobuz_client
+from mopidy_qobuz.client import cache
+
+
+@pytest.fixture
+def sqlite_cache(tmp_path):
+    # Evicted down to 10.8 bytes
+    cache_ = cache.SQLiteCache(tmp_path / "cache.sqlite3", max_size=12)
+    yield cache_
+    cache_.close()
+
+
+def test_memory_cache_lru_eviction():
+    cache_ = cache.MemoryCache(max_size=10)
+    cache_.set("a", b"12345", 60)
+    cache_.set("b", b"12345", 60)
+    assert cache_.get("a") == b"12345"
+
+    cache_.set("c", b"12345", 60)
+    assert cache_.get("b") is None
+    assert cache_.get("a") == b"12345"
+    assert cache_.get("c") == b"12345"
+
+
+def test_memory_cache_expired():
+    cache_ = cache.MemoryCache()
+    cache_.set("a", b"foo", -1)
+    assert cache_.get("a") is None
+    assert len(cache_) == 0
+
+
+def test_sqlite_cache_lru_eviction(sqlite_cache):
+    sqlite_cache.set("a", b"12345", 60)
+    sqlite_cache.set("b", b"12345", 60)
+    assert sqlite_cache.get("a") == b"12345"
+
+    sqlite_cache.set("c", b"12345", 60)
+    assert sqlite_cache.get("b") is None
+    assert sqlite_cache.get("a") == b"12345"
+
+
+def test_sqlite_cache_evicts_down_to_low_water(tmp_path):
+    cache_ = cache.SQLiteCache(tmp_path / "cache.sqlite3", max_size=100)
+    for key in range(9):
+        cache_.set(str(key), b"0123456789", 60)
+    cache_.set("expired", b"0", -1)
+
+    # 101 bytes: evicted down to 90, the expired entry first, then the oldest
+    cache_.set("new", b"0123456789", 60)
+    assert cache_.get("expired") is None
+    assert cache_.get("0") is None
+    assert cache_.get("1") == b"0123456789"
+    assert cache_._size == 90
+
+    # Several entries go at once when more room is needed ("1" was read)
+    cache_.set("big", b"0" * 30, 60)
+    assert [cache_.get(str(key)) for key in range(2, 5)] == [None] * 3
+    assert cache_.get("1") == b"0123456789"
+    assert cache_._size == 90
+    cache_.close()
+
+
+def test_sqlite_cache_persists(tmp_path):
+    cache_ = cache.SQLiteCache(tmp_path / "cache.sqlite3")
+    cache_.set("a", b"foo", 60)
+    cache_.set("b", b"bar", -1)
+    cache_.close()
+
+    cache_ = cache.SQLiteCache(tmp_path / "cache.sqlite3")
+    assert cache_.get("a") == b"foo"
+    assert cache_.get("b") is None
+    cache_.close()
+
+
+def _response(content):
+    response = mock.Mock(status_code=200, content=content)
+    response.json.return_value = {"id": "foo"}
+    return response
+
+
+def test_client_get_cached():
+    session = mock.Mock(headers={})
+    session.get.return_value = _response(b'{"id": "foo"}')
+    client = qobuz_client.Client(
+        "123", "abc", session=session, cache=cache.MemoryCache()
+    )
+
+    assert client.get("album/get", {"album_id": "foo"}).json() == {"id": "foo"}
+    assert client.get("album/get", {"album_id": "foo"}).json() == {"id": "foo"}
+    assert session.get.call_count == 1
+
+
+def test_client_get_not_cached_endpoint():
+    session = mock.Mock(headers={})
+    session.get.return_value = _response(b'{"url": "foo"}')
+    client = qobuz_client.Client(
+        "123", "abc", session=session, cache=cache.MemoryCache()
+    )
+
+    client.get("track/getFileUrl", {"track_id": "foo"})
+    client.get("track/getFileUrl", {"track_id": "foo"})
+    assert session.get.call_count == 2
+
+
+def test_cache_key_ignores_none_and_order():
+    assert qobuz_client._cache_key(
+        "album/getFeatured", {"type": "new", "genre_ids": None, "limit": 25}
+    ) == qobuz_client._cache_key("album/getFeatured", {"limit": "25", "type": "new"})
+
+
+def test_ttl_cache():
+    cache_ = cache.TTLCache(60, max_items=2)
+    cache_.set("a", 1)
+    cache_.set("b", 2)
+    assert cache_.get("a") == 1
+
+    cache_.set("c", 3)
+    assert cache_.get("b") is None
+    assert cache_.get("a") == 1
+
+    cache_.ttl = -1
+    cache_.set("d", 4)
+    assert cache_.get("d") is None
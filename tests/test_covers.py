@@ -0,0 +1,73 @@
+from concurrent.futures import ThreadPoolExecutor
+import pathlib
+import threading
+from unittest import mock
+
+import pytest
+
+from mopidy_qobuz import covers
+
+_IMAGE = {
+    "thumbnail": "https://img/1_50.jpg",
+    "small": "https://img/1_230.jpg",
+    "large": "https://img/1_600.jpg",
+}
+
+
+@pytest.fixture
+def store(tmp_path):
+    session = mock.Mock()
+    session.get.side_effect = lambda url, timeout: mock.Mock(content=url.encode())
+    return covers.CoverStore(tmp_path, session=session)
+
+
+@pytest.fixture(autouse=True)
+def no_pillow(monkeypatch):
+    monkeypatch.setattr(covers, "Image", None)
+
+
+def test_cover_downloaded_once(store):
+    store.register("1", _IMAGE)
+
+    assert store.get("1", 150).read_bytes() == b"https://img/1_230.jpg"
+    assert store.get("1", 150) == store.path / "150" / "1.jpg"
+    assert store.get("1", 64).read_bytes() == b"https://img/1_230.jpg"
+    assert store.get("1", 600).read_bytes() == b"https://img/1_600.jpg"
+    assert store._session.get.call_count == 3
+
+
+def test_stored_cover_served_without_source(store, tmp_path):
+    store.register("1", _IMAGE)
+    store.get("1", 300)
+
+    store = covers.CoverStore(tmp_path, session=mock.Mock())
+    assert store.get("1", 300).read_bytes() == b"https://img/1_600.jpg"
+    assert store.get("2", 300) is None
+    assert store.get("1", 123) is None
+
+
+def test_failed_download(store):
+    store._session.get.side_effect = OSError
+    store.register("1", _IMAGE)
+
+    assert store.get("1", 64) is None
+    assert not (store.path / "64" / "1.jpg").exists()
+
+
+def test_concurrent_requests_for_a_cover(store, monkeypatch):
+    store.register("1", _IMAGE)
+    # Both files are written before either replaces the cover
+    barrier = threading.Barrier(2, timeout=5)
+    replace = pathlib.Path.replace
+
+    def replace_together(path, target):
+        barrier.wait()
+        return replace(path, target)
+
+    monkeypatch.setattr(pathlib.Path, "replace", replace_together)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        files = list(executor.map(lambda _: store.get("1", 150), range(2)))
+
+    assert files == [store.path / "150" / "1.jpg"] * 2
+    assert files[0].read_bytes() == b"https://img/1_230.jpg"
+    assert [path.name for path in files[0].parent.iterdir()] == ["1.jpg"]
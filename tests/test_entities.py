@@ -0,0 +1,190 @@
+import itertools
+import json
+import threading
+from unittest import mock
+
+import pytest
+import requests
+
+from mopidy_qobuz import client as qobuz_client
+
+_ARTIST = {"id": 1, "name": "Kanye West"}
+_ALBUM = {
+    "id": "0060253743926",
+    "title": "Yeezus",
+    "artist": _ARTIST,
+    "streamable": True,
+}
+
+
+@pytest.fixture
+def client():
+    return qobuz_client.Client("123", "abc", session=mock.Mock(headers={}))
+
+
+def _track(id, album=_ALBUM):
+    return {"id": id, "title": f"Track {id}", "album": album, "performer": _ARTIST}
+
+
+def test_tracks_share_album_and_artist(client):
+    tracks = [qobuz_client.Track.from_data(client, _track(id)) for id in range(10)]
+
+    assert len({id(track.album) for track in tracks}) == 1
+    assert len({id(track.artist) for track in tracks}) == 1
+    assert tracks[0].artist is tracks[0].album.artist
+
+
+def test_richer_payload_is_merged(client):
+    album = qobuz_client.Album.from_data(
+        client, {"id": "foo", "title": "Foo", "artist": _ARTIST}
+    )
+    assert album.release_type is None
+
+    merged = qobuz_client.Album.from_data(
+        client,
+        {"id": "foo", "release_type": "album", "tracks": {"items": [_track(1)]}},
+    )
+
+    assert merged is album
+    assert album.title == "Foo"
+    assert album.release_type == "album"
+    assert album.tracks[0].album is album
+
+
+def test_identity_map_is_weak(client):
+    qobuz_client.Album.from_data(client, {"id": "foo", "artist": _ARTIST})
+    assert client.entities.get(qobuz_client.Album, "foo") is None
+
+
+def test_from_data_without_id(client):
+    with pytest.raises(ValueError):
+        qobuz_client.Album.from_data(client, {"title": "Foo"})
+
+
+def _response(data):
+    response = requests.Response()
+    response.status_code = 200
+    response._content = json.dumps(data).encode()
+    response._content_consumed = True
+    return response
+
+
+def _playlist_page(url, params, **kwargs):
+    offset = params["offset"]
+    items = [_track(id) for id in range(offset, min(offset + 500, 1234))]
+    return _response({"id": 1, "tracks_count": 1234, "tracks": {"items": items}})
+
+
+def test_playlist_pages_fetched_in_order(client):
+    client._session.get = mock.Mock(side_effect=_playlist_page)
+    playlist = qobuz_client.Playlist.from_data(client, {"id": 1})
+
+    assert [track.id for track in playlist.tracks] == list(range(1234))
+    assert client._session.get.call_count == 3
+    # The pages after the first are streamed
+    assert [call.kwargs.get("stream") for call in client._session.get.mock_calls] == [
+        None,
+        True,
+        True,
+    ]
+
+
+def test_playlist_tracks_iterated_lazily(client):
+    client._session.get = mock.Mock(side_effect=_playlist_page)
+    playlist = qobuz_client.Playlist.from_data(client, {"id": 1})
+
+    tracks = list(itertools.islice(playlist.iter_tracks(), 10))
+
+    assert [track.id for track in tracks] == list(range(10))
+    assert client._session.get.call_count == 1
+    assert len(playlist.tracks) == 1234
+
+
+def test_playlist_pages_closed_when_stopped_early(client):
+    client._session.get = mock.Mock(side_effect=_playlist_page)
+    client.max_workers = 1
+    playlist = qobuz_client.Playlist.from_data(client, {"id": 1})
+
+    closed = []
+    with mock.patch.object(
+        requests.Response, "close", autospec=True, side_effect=closed.append
+    ):
+        tracks = list(itertools.islice(playlist.iter_tracks(), 600))
+        del tracks
+
+    streamed = [
+        call for call in client._session.get.mock_calls if call.kwargs.get("stream")
+    ]
+    assert 1 <= len(streamed) <= 2
+    assert len(closed) == len(streamed)
+
+
+def _streamed_page(body, released):
+    "A response whose body is read in two halves, the second once released"
+    response = _response({})
+
+    def iter_content(size):
+        yield body[: len(body) // 2]
+        assert released.wait(timeout=5), "The first half wasn't parsed yet"
+        yield body[len(body) // 2 :]
+
+    response.iter_content = iter_content
+    return response
+
+
+def test_playlist_items_yielded_while_pages_are_read(client):
+    released = threading.Event()
+
+    def get(url, params, **kwargs):
+        if not kwargs.get("stream"):
+            items = [_track(id) for id in range(500)]
+            return _response({"tracks_count": 1000, "tracks": {"items": items}})
+
+        items = [_track(id) for id in range(500, 1000)]
+        body = json.dumps({"tracks": {"items": items}}).encode()
+        return _streamed_page(body, released)
+
+    client._session.get = mock.Mock(side_effect=get)
+    playlist = qobuz_client.Playlist.from_data(client, {"id": 1})
+
+    tracks = playlist.iter_tracks()
+    assert [next(tracks).id for _ in range(501)][-1] == 500
+    released.set()
+    assert [track.id for track in tracks][-1] == 999
+
+
+def test_playlist_page_errors_raised(client):
+    def get(url, params, **kwargs):
+        if kwargs.get("stream"):
+            raise requests.ConnectionError
+
+        return _playlist_page(url, params)
+
+    client._session.get = mock.Mock(side_effect=get)
+    client.transport.retries = 0
+    playlist = qobuz_client.Playlist.from_data(client, {"id": 1})
+
+    with pytest.raises(requests.ConnectionError):
+        list(playlist.iter_tracks())
+
+
+def test_entities_are_slotted(client):
+    track = qobuz_client.Track.from_data(client, _track(1))
+
+    for entity in (track, track.album, track.artist):
+        assert not hasattr(entity, "__dict__")
+
+
+def test_lazy_attributes_are_fetched(client):
+    response = mock.Mock()
+    response.json.return_value = dict(
+        _ALBUM, upc="0602537439266", label={"id": 2, "name": "Def Jam"}
+    )
+    client.get = mock.Mock(return_value=response)
+    album = qobuz_client.Album.from_data(client, dict(_ALBUM, upc="ignored"))
+
+    assert client.get.call_count == 0
+    assert album.upc == "0602537439266"
+    assert album.label.name == "Def Jam"
+    with pytest.raises(AttributeError):
+        album.foo
@@ -1,6 +1,10 @@
+import sys
 from unittest import mock
 
+import pytest
+
 from mopidy_qobuz import backend as backend_lib
+from mopidy_qobuz import covers
 from mopidy_qobuz import Extension
 
 
@@ -19,6 +23,14 @@ def test_get_default_config():
     assert "search_track_count = 10" in config
     assert "search_artist_count = 0" in config
     assert "custom_libraries =" in config
+    assert "metadata_cache_size = 64" in config
+    assert "prefetch_count = 1" in config
+    assert "audio_cache_size = 0" in config
+    assert "cover_proxy = true" in config
+    assert "library_mirror = true" in config
+    assert "search_remote = true" in config
+    assert "artist_lookup_count = 100" in config
+    assert "artist_lookup_order = appearances" in config
 
 
 def test_get_config_schema():
@@ -36,12 +48,40 @@ def test_get_config_schema():
     assert "search_track_count" in schema
     assert "search_artist_count" in schema
     assert "custom_libraries" in schema
+    assert "metadata_cache_size" in schema
+    assert "prefetch_count" in schema
+    assert "audio_cache_size" in schema
+    assert "cover_proxy" in schema
+    assert "library_mirror" in schema
+    assert "search_remote" in schema
+    assert "artist_lookup_count" in schema
+    assert "artist_lookup_order" in schema
 
 
-def test_setup():
+def test_setup(monkeypatch):
+    try:
+        from mopidy_qobuz import frontend as frontend_lib
+    except ImportError:
+        # The frontend is a core listener, which needs the GStreamer bindings
+        frontend_lib = mock.Mock()
+        monkeypatch.setitem(sys.modules, "mopidy_qobuz.frontend", frontend_lib)
     registry = mock.Mock()
 
     ext = Extension()
     ext.setup(registry)
-    calls = [mock.call("backend", backend_lib.QobuzBackend)]
+    calls = [
+        mock.call("backend", backend_lib.QobuzBackend),
+        mock.call("frontend", frontend_lib.QobuzFrontend),
+        mock.call("http:app", {"name": "qobuz", "factory": covers.factory}),
+    ]
     registry.add.assert_has_calls(calls, any_order=True)
+
+
+def test_get_command():
+    # Mopidy's commands need the GStreamer bindings
+    pytest.importorskip("mopidy.commands")
+    from mopidy_qobuz import commands
+
+    command = Extension().get_command()
+    assert isinstance(command, commands.QobuzCommand)
+    assert isinstance(command._children["warm"], commands.WarmCommand)
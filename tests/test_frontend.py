@@ -0,0 +1,42 @@
+from unittest import mock
+
+from mopidy import models
+import pytest
+
+frontend = pytest.importorskip("mopidy_qobuz.frontend")
+
+
+def _tl_tracks(*uris):
+    return [
+        models.TlTrack(tlid=tlid, track=models.Track(uri=uri))
+        for tlid, uri in enumerate(uris, 1)
+    ]
+
+
+def _frontend(qobuz_config, tl_tracks, index):
+    core = mock.Mock()
+    core.tracklist.get_tl_tracks.return_value.get.return_value = tl_tracks
+    core.tracklist.index.return_value.get.return_value = index
+    return frontend.QobuzFrontend(qobuz_config, core)
+
+
+def test_upcoming_uris(qobuz_config):
+    tl_tracks = _tl_tracks(
+        "qobuz:track:1", "local:track:foo.flac", "qobuz:track:2", "qobuz:track:3"
+    )
+    frontend_ = _frontend(qobuz_config, tl_tracks, 0)
+
+    assert frontend_._upcoming_uris() == ["qobuz:track:2"]
+
+    frontend_._prefetch_count = 2
+    assert frontend_._upcoming_uris() == ["qobuz:track:2", "qobuz:track:3"]
+
+
+def test_prefetch_calls_backend(qobuz_config):
+    frontend_ = _frontend(qobuz_config, _tl_tracks("qobuz:track:1"), None)
+    backend = mock.Mock()
+
+    with mock.patch.object(frontend, "_get_backend", return_value=backend):
+        frontend_.track_playback_started(None)
+
+    backend.playback.prefetch.assert_called_once_with(["qobuz:track:1"])
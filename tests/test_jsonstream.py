@@ -0,0 +1,34 @@
+import json
+
+import pytest
+
+from mopidy_qobuz.client import jsonstream
+
+_PAGE = {
+    "id": 1,
+    "name": "Café ♫",
+    "owner": {"tracks": {"items": ["not these"]}},
+    "tracks": {"offset": 0, "total": 3, "items": [{"id": 1}, 2.5, "é", None, 12345]},
+}
+
+
+def _chunks(data, size):
+    content = json.dumps(data, ensure_ascii=False, indent=1).encode()
+    return [content[start : start + size] for start in range(0, len(content), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1024])
+def test_items_across_chunk_boundaries(size):
+    items = list(jsonstream.iter_items(_chunks(_PAGE, size), "tracks"))
+
+    assert items == _PAGE["tracks"]["items"]
+
+
+def test_missing_listing():
+    assert list(jsonstream.iter_items(_chunks(_PAGE, 7), "albums")) == []
+    assert list(jsonstream.iter_items(_chunks({"tracks": []}, 7), "tracks")) == []
+
+
+def test_truncated_document():
+    with pytest.raises(json.JSONDecodeError):
+        list(jsonstream.iter_items(_chunks(_PAGE, 7)[:-3], "tracks"))
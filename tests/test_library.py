@@ -0,0 +1,301 @@
+import gc
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from mopidy_qobuz import backend as backend_lib
+from mopidy_qobuz import client as qobuz_client
+from mopidy_qobuz import covers
+from mopidy_qobuz import images
+from mopidy_qobuz import search_index
+
+_ARTIST = {"id": 1, "name": "Kanye West"}
+
+
+def _track(id, album_id="1"):
+    return {
+        "id": id,
+        "title": f"Track {id}",
+        "streamable": True,
+        "album": {"id": album_id, "artist": _ARTIST, "streamable": True},
+        "performer": _ARTIST,
+    }
+
+
+def _album(id, track_ids):
+    return {
+        "id": id,
+        "title": "Yeezus",
+        "artist": _ARTIST,
+        "streamable": True,
+        "tracks": {"items": [_track(track_id, id) for track_id in track_ids]},
+    }
+
+
+def _get(endpoint, params):
+    response = mock.Mock()
+    if endpoint == "album/get":
+        response.json.return_value = _album(params["album_id"], [10, 11])
+    elif endpoint == "playlist/get":
+        items = [_track(3, "5"), _track(4, "5")]
+        for item in items:
+            item["album"]["image"] = {"small": "https://img/5_small.jpg"}
+        response.json.return_value = {
+            "id": params["playlist_id"],
+            "name": "Playlist",
+            "tracks_count": 2,
+            "tracks": {"items": items},
+        }
+    else:
+        response.json.return_value = _track(params["track_id"], "2")
+    return response
+
+
+@pytest.fixture
+def backend(qobuz_config):
+    backend_ = backend_lib.QobuzBackend(config=qobuz_config, audio=mock.Mock())
+    backend_._client = qobuz_client.Client("123", "abc", session=mock.Mock(headers={}))
+    backend_._client.get = mock.Mock(side_effect=_get)
+    backend_._image_index = images.ImageIndex()
+    backend_._client.entities.subscribe(backend_._image_index.observe)
+    backend_._client.entities.subscribe_raw(backend_._image_index.observe_raw)
+    backend_._search_index = search_index.SearchIndex()
+    backend_._client.entities.subscribe(backend_._search_index.observe)
+    backend_._client.entities.subscribe_raw(backend_._search_index.observe_raw)
+    yield backend_
+    backend_.on_stop()
+
+
+def test_stop_waits_for_running_jobs(backend):
+    started = threading.Event()
+
+    def search():
+        started.set()
+        time.sleep(0.1)
+        return backend._search_index.search({"any": ["kanye"]})
+
+    job = backend._executor.submit(search)
+    started.wait(timeout=5)
+    backend.on_stop()
+    assert job.result(timeout=0) == {"artist": [], "album": [], "track": []}
+
+
+def test_lookup_keeps_order(backend):
+    tracks = backend.library.lookup(
+        ["qobuz:track:20", "qobuz:album:1", "local:track:foo", "qobuz:track:21"]
+    )
+    assert [track.uri for track in tracks] == [
+        "qobuz:track:20",
+        "qobuz:track:10",
+        "qobuz:track:11",
+        "qobuz:track:21",
+    ]
+
+
+def test_lookup_dedupes_and_reuses_album_tracks(backend):
+    tracks = backend.library.lookup(
+        ["qobuz:album:1", "qobuz:track:10", "qobuz:track:10", "qobuz:track:20"]
+    )
+
+    assert [track.uri for track in tracks] == [
+        "qobuz:track:10",
+        "qobuz:track:11",
+        "qobuz:track:10",
+        "qobuz:track:10",
+        "qobuz:track:20",
+    ]
+    endpoints = [call.args[0] for call in backend._client.get.call_args_list]
+    assert sorted(endpoints) == ["album/get", "track/get"]
+
+
+def test_lookup_reuses_recent_album_tracks_after_gc(backend):
+    backend.library.lookup(["qobuz:album:1"])
+    # The search index holds the entities it hasn't indexed yet
+    backend._search_index.flush()
+    gc.collect()
+
+    tracks = backend.library.lookup(["qobuz:track:10"])
+
+    assert [track.uri for track in tracks] == ["qobuz:track:10"]
+    endpoints = [call.args[0] for call in backend._client.get.call_args_list]
+    assert endpoints == ["album/get"]
+
+
+def test_lookup_isolates_failures(backend):
+    backend._client.get.side_effect = qobuz_client.NotFoundError
+    assert backend.library.lookup(["qobuz:track:1", "qobuz:album:2"]) == []
+
+
+def _artist_get(endpoint, params):
+    response = mock.Mock()
+    if endpoint == "album/get":
+        id = int(params["album_id"])
+        response.json.return_value = _album(str(id), [id * 10, id * 10 + 1])
+    elif params["extra"] == "albums":
+        albums = [
+            dict(_album(str(id), []), release_date_original=f"20{id}-01-01")
+            for id in (10, 22, 15)
+        ]
+        for album in albums:
+            del album["tracks"]
+        response.json.return_value = {"albums_count": 3, "albums": {"items": albums}}
+    else:
+        offset = params["offset"]
+        items = [_track(id) for id in range(offset, offset + params["limit"])]
+        response.json.return_value = {
+            "tracks_count": 5000,
+            "tracks_appears_on": {"items": items},
+        }
+    return response
+
+
+def test_lookup_artist_capped_and_cached(backend):
+    backend._client.get.side_effect = _artist_get
+    backend._client.cache = qobuz_client.MemoryCache()
+    backend.library._config["artist_lookup_count"] = 3
+
+    tracks = backend.library.lookup(["qobuz:artist:1"])
+    assert [track.uri for track in tracks] == [f"qobuz:track:{id}" for id in range(3)]
+    assert backend._client.get.call_count == 1
+
+    assert backend.library.lookup(["qobuz:artist:1"]) == tracks
+    assert backend._client.get.call_count == 1
+
+
+def test_lookup_artist_newest_releases_first(backend):
+    backend._client.get.side_effect = _artist_get
+    backend.library._config["artist_lookup_count"] = 3
+    backend.library._config["artist_lookup_order"] = "releases"
+
+    tracks = backend.library.lookup(["qobuz:artist:1"])
+
+    assert [track.uri for track in tracks] == [
+        "qobuz:track:220",
+        "qobuz:track:221",
+        "qobuz:track:150",
+    ]
+
+
+def _search_get(endpoint, params):
+    response = mock.Mock()
+    response.json.return_value = {
+        "albums": {"items": [_album("1", [])]},
+        "tracks": {"items": [_track(10)]},
+    }
+    return response
+
+
+def test_search_concurrent_and_cached(backend):
+    backend._client.get.side_effect = _search_get
+
+    result = backend.library.search({"any": ["Kanye  West"]})
+    assert [album.uri for album in result.albums] == ["qobuz:album:1"]
+    assert [track.uri for track in result.tracks] == ["qobuz:track:10"]
+    assert result.artists == ()
+
+    assert backend.library.search({"any": ["kanye west "]}) is result
+    endpoints = [call.args[0] for call in backend._client.get.call_args_list]
+    assert sorted(endpoints) == ["album/search", "track/search"]
+
+
+def _image(id):
+    return {key: f"https://img/{id}_{key}.jpg" for key in ("small", "thumbnail")}
+
+
+def _image_get(endpoint, params):
+    response = mock.Mock()
+    if endpoint == "album/get":
+        data = _album(params["album_id"], [])
+    else:
+        data = _track(params["track_id"], "2")
+    data.get("album", data)["image"] = _image(data.get("album", data)["id"])
+    response.json.return_value = data
+    return response
+
+
+def test_get_images_indexed_and_all_sizes(backend):
+    backend._client.get.side_effect = _image_get
+    uris = ["qobuz:album:1", "qobuz:track:20", "qobuz:artist:1"]
+
+    result = backend.library.get_images(uris)
+    assert set(result) == {"qobuz:album:1", "qobuz:track:20"}
+    assert [(image.uri, image.width) for image in result["qobuz:album:1"]] == [
+        ("https://img/1_thumbnail.jpg", 50),
+        ("https://img/1_small.jpg", 230),
+    ]
+    assert result["qobuz:track:20"][0].uri == "https://img/2_thumbnail.jpg"
+
+    # Album 2 is known from the track payload, nothing is fetched again
+    assert backend.library.get_images(uris + ["qobuz:album:2"]) == dict(
+        result, **{"qobuz:album:2": result["qobuz:track:20"]}
+    )
+    assert backend._client.get.call_count == 2
+
+
+def test_playlist_lookup_fills_the_indexes(backend):
+    tracks = backend.library.lookup(["qobuz:playlist:1"])
+    assert [track.uri for track in tracks] == ["qobuz:track:3", "qobuz:track:4"]
+    backend._client.get.reset_mock()
+
+    result = backend.library.get_images(["qobuz:track:3"])
+    assert result["qobuz:track:3"][0].uri == "https://img/5_small.jpg"
+    found = backend._search_index.search({"track_name": ["track 4"]})
+    assert [track.uri for track in found["track"]] == ["qobuz:track:4"]
+    found = backend._search_index.search({"albumartist": ["kanye"]})
+    assert [album.uri for album in found["album"]] == ["qobuz:album:5"]
+    assert not backend._client.get.called
+
+
+def test_image_index_persists(tmp_path):
+    index = images.ImageIndex(tmp_path / "images.sqlite3")
+    index.add_album("1", _image("1"))
+    index.add_track("10", "1")
+    index.close()
+
+    index = images.ImageIndex(tmp_path / "images.sqlite3")
+    assert index.track_image(10) == _image("1")
+    assert index.album_image("2") is None
+    index.close()
+
+
+def test_image_index_memory_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(images, "_REMEMBERED", 2)
+    index = images.ImageIndex(tmp_path / "images.sqlite3")
+    assert index.album_image("1") is None
+    for id in "123":
+        index.add_album(id, _image(id))
+
+    assert list(index._albums) == ["2", "3"]
+    # Forgotten, but stored (and read again)
+    assert index.album_image("1") == _image("1")
+    assert list(index._albums) == ["3", "1"]
+    index.close()
+
+
+def test_get_images_cover_proxy(backend, tmp_path):
+    backend._client.get.side_effect = _image_get
+    backend.library._covers = covers.CoverStore(tmp_path)
+
+    result = backend.library.get_images(["qobuz:track:20"])
+    assert [(image.uri, image.width) for image in result["qobuz:track:20"]] == [
+        ("/qobuz/covers/64/2.jpg", 64),
+        ("/qobuz/covers/150/2.jpg", 150),
+        ("/qobuz/covers/300/2.jpg", 300),
+        ("/qobuz/covers/600/2.jpg", 600),
+    ]
+    assert backend.library._covers._sources["2"] == _image("2")
+
+
+def test_search_exact_and_distinct_are_local(backend):
+    backend.library.lookup(["qobuz:album:1"])
+    backend._client.get.reset_mock()
+
+    result = backend.library.search({"album": ["Yeezus"]}, exact=True)
+    assert [track.uri for track in result.tracks] == [
+        "qobuz:track:10",
+        "qobuz:track:11",
+    ]
+    assert backend.library.get_distinct("album") == {"Yeezus"}
+    assert backend._client.get.call_count == 0
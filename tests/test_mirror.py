@@ -0,0 +1,110 @@
+from unittest import mock
+
+import pytest
+
+from mopidy_qobuz import client as qobuz_client
+
+_ARTIST = {"id": 1, "name": "Kanye West"}
+
+
+class _Api:
+    def __init__(self):
+        self.favorite_ids = {"albums": ["1", "2"], "artists": [1], "tracks": []}
+        self.playlists = [{"id": 10, "name": "Foo", "tracks_count": 2, "updated_at": 1}]
+        self.calls = []
+
+    def get(self, endpoint, params, refresh=False):
+        self.calls.append(endpoint)
+        response = mock.Mock()
+        response.json.return_value = self._json(endpoint, params)
+        return response
+
+    def _json(self, endpoint, params):
+        if endpoint == "favorite/getUserFavoriteIds":
+            return self.favorite_ids
+        if endpoint == "favorite/getUserFavorites":
+            type, offset = params["type"], params["offset"]
+            ids = self.favorite_ids[type]
+            items = [self._favorite(type, id) for id in ids]
+            items = items[offset : offset + params["limit"]]
+            return {type: {"items": items, "total": len(ids)}}
+        if endpoint == "playlist/getUserPlaylists":
+            return {"playlists": {"items": self.playlists, "total": 1}}
+        if endpoint == "playlist/get":
+            album = {"id": "1", "artist": _ARTIST}
+            items = [
+                {"id": id, "album": album, "performer": _ARTIST} for id in (100, 101)
+            ]
+            return {"tracks": {"items": items, "total": 2}}
+        raise AssertionError(endpoint)
+
+    def _favorite(self, type, id):
+        if type == "artists":
+            return dict(_ARTIST, id=id)
+        return {"id": id, "title": f"Album {id}", "artist": _ARTIST, "tracks": {}}
+
+
+@pytest.fixture
+def api():
+    return _Api()
+
+
+@pytest.fixture
+def client(api):
+    client = qobuz_client.Client("123", "abc", session=mock.Mock(headers={}))
+    client.get = api.get
+    client.mirror = qobuz_client.LibraryMirror()
+    return client
+
+
+def test_not_served_before_sync(client):
+    assert client.mirror.favorites("albums") is None
+    assert client.mirror.playlist(10) is None
+
+
+def test_served_after_sync(client, api):
+    client.mirror.sync(client)
+    api.calls.clear()
+
+    user = qobuz_client.User(client)
+    page = user.get_favorites_page("albums", limit=1)
+    assert [album.title for album in page.items] == ["Album 1"]
+    assert page.total == 2
+    assert [artist.name for artist in user.get_favorites_artists()] == ["Kanye West"]
+
+    playlist = qobuz_client.Playlist.from_id(client, 10)
+    assert [track.id for track in playlist.tracks] == [100, 101]
+    assert api.calls == []
+
+
+def test_incremental_sync(client, api):
+    client.mirror.sync(client)
+    api.calls.clear()
+
+    api.favorite_ids["albums"] = ["3", "1"]
+    client.mirror.sync(client)
+    assert sorted(api.calls) == [
+        "favorite/getUserFavoriteIds",
+        "favorite/getUserFavorites",
+        "playlist/getUserPlaylists",
+    ]
+    albums = client.mirror.favorites("albums")["items"]
+    assert [album["id"] for album in albums] == ["3", "1"]
+
+    api.playlists[0]["updated_at"] = 2
+    api.calls.clear()
+    client.mirror.sync_playlists(client)
+    assert api.calls == ["playlist/getUserPlaylists", "playlist/get"]
+
+
+def test_favorites_are_fetched_by_pages(client, api):
+    api.favorite_ids["albums"] = [str(id) for id in range(1200)]
+    client.mirror.sync(client)
+    assert api.calls.count("favorite/getUserFavorites") == 3 + 1
+
+    page = client.mirror.favorites("albums", offset=1100, limit=200)
+    assert page["total"] == 1200
+    assert [album["id"] for album in page["items"]] == [
+        str(id) for id in range(1100, 1200)
+    ]
+    assert "tracks" not in page["items"][0]
@@ -0,0 +1,99 @@
+import datetime
+import threading
+from unittest import mock
+
+import pytest
+
+from mopidy_qobuz import backend as backend_lib
+from mopidy_qobuz import playback
+
+
+@pytest.fixture
+def backend(qobuz_config):
+    backend_ = backend_lib.QobuzBackend(config=qobuz_config, audio=mock.Mock())
+    backend_._client = mock.Mock()
+    yield backend_
+    backend_.on_stop()
+
+
+def _downloadable(url="https://foo/track.flac", expires_in=3600):
+    etsp = datetime.datetime.now() + datetime.timedelta(seconds=expires_in)
+    return mock.Mock(url=url, demo=False, was_fallback=False, etsp=etsp)
+
+
+def test_translate_uri(backend):
+    with mock.patch.object(playback, "DownloadableTrack") as downloadable_cls:
+        downloadable_cls.from_id.return_value = _downloadable()
+        assert (
+            backend.playback.translate_uri("qobuz:track:1") == "https://foo/track.flac"
+        )
+        assert (
+            backend.playback.translate_uri("qobuz:track:1") == "https://foo/track.flac"
+        )
+
+    downloadable_cls.from_id.assert_called_once_with(backend._client, "1", format_id=6)
+
+
+def test_translate_uri_not_found(backend):
+    with mock.patch.object(playback, "DownloadableTrack") as downloadable_cls:
+        downloadable_cls.from_id.side_effect = Exception
+        assert backend.playback.translate_uri("qobuz:track:1") is None
+
+    # Not tried again: the client's transport retries the transient errors
+    assert downloadable_cls.from_id.call_count == 1
+
+
+def test_resolve_runs_in_playback_lane(backend):
+    threads = []
+
+    def from_id(*args, **kwargs):
+        threads.append(threading.current_thread().name)
+        return _downloadable()
+
+    with mock.patch.object(playback, "DownloadableTrack") as downloadable_cls:
+        downloadable_cls.from_id.side_effect = from_id
+        assert backend.playback.resolve("1").result() is not None
+
+    assert threads[0].startswith("qobuz-playback")
+
+
+def test_stream_url_cache_evicts_expired():
+    cache = playback.StreamUrlCache(margin=60)
+    cache.put(("1", 6), _downloadable(expires_in=3600))
+    cache.put(("2", 6), _downloadable(expires_in=30))
+
+    assert ("1", 6) in cache
+    assert ("2", 6) not in cache
+    assert ("1", 27) not in cache
+
+
+def test_stream_url_cache_bounded():
+    cache = playback.StreamUrlCache(max_size=2)
+    cache.put(("1", 6), _downloadable(expires_in=3000))
+    cache.put(("2", 6), _downloadable(expires_in=1000))
+    cache.put(("3", 6), _downloadable(expires_in=2000))
+
+    assert len(cache) == 2
+    assert ("2", 6) not in cache
+
+
+def test_prefetch_schedules_refresh(backend):
+    with mock.patch.object(playback, "DownloadableTrack") as downloadable_cls:
+        downloadable_cls.from_id.return_value = _downloadable(expires_in=3600)
+        backend.playback.prefetch(["qobuz:track:1"])
+        backend.playback.resolve("1").result()
+
+    timer = backend.playback._refresh_timer
+    assert timer is not None
+    assert 3600 - 60 - 300 - 5 < timer.interval <= 3600 - 60 - 300
+
+
+def test_failed_refresh_is_tried_again(backend):
+    with mock.patch.object(playback, "DownloadableTrack") as downloadable_cls:
+        downloadable_cls.from_id.side_effect = Exception
+        backend.playback.prefetch(["qobuz:track:1"])
+        assert backend.playback.resolve("1").result() is None
+
+    timer = backend.playback._refresh_timer
+    assert timer is not None
+    assert timer.interval == playback._RETRY_DELAY
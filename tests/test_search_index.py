@@ -0,0 +1,104 @@
+import threading
+from unittest import mock
+
+import pytest
+
+from mopidy_qobuz import client as qobuz_client
+from mopidy_qobuz import search_index
+
+_KANYE = {"id": 1, "name": "Kanye West"}
+_BACH = {"id": 2, "name": "Johann Sebastian Bach"}
+
+
+def _album(id, title, artist):
+    return {"id": id, "title": title, "artist": artist, "streamable": True}
+
+
+_TRACKS = (
+    {
+        "id": 10,
+        "title": "Black Skinhead",
+        "album": _album("a", "Yeezus", _KANYE),
+        "performer": _KANYE,
+        "streamable": True,
+    },
+    {
+        "id": 20,
+        "title": "Goldberg Variations: Aria",
+        "album": _album("b", "Goldberg Variations", _BACH),
+        "performer": {"id": 3, "name": "Glenn Gould"},
+        "composer": _BACH,
+        "streamable": True,
+    },
+)
+
+
+@pytest.fixture
+def index():
+    client = qobuz_client.Client("123", "abc", session=mock.Mock(headers={}))
+    index_ = search_index.SearchIndex()
+    client.entities.subscribe(index_.observe)
+    for data in _TRACKS:
+        qobuz_client.Track.from_data(client, data)
+
+    yield index_
+    index_.close()
+
+
+def test_search_prefixes(index):
+    result = index.search({"any": ["yeez"]})
+    assert [album.uri for album in result["album"]] == ["qobuz:album:a"]
+    assert [track.uri for track in result["track"]] == ["qobuz:track:10"]
+    assert result["track"][0].album.name == "Yeezus"
+
+
+def test_search_field_scoped(index):
+    result = index.search({"composer": ["bach"], "track_name": ["aria"]})
+    assert [track.uri for track in result["track"]] == ["qobuz:track:20"]
+    assert index.search({"artist": ["bach"], "track_name": ["aria"]})["track"] == []
+    assert index.search({"genre": ["rock"]})["track"] == []
+
+
+def test_search_exact(index):
+    assert index.search({"album": ["yeezus"]}, exact=True)["album"]
+    assert not index.search({"album": ["yeez"]}, exact=True)["album"]
+
+
+def test_get_distinct(index):
+    assert index.get_distinct("albumartist") == {"Kanye West", "Johann Sebastian Bach"}
+    assert index.get_distinct("album", {"albumartist": ["kanye west"]}) == {"Yeezus"}
+    assert index.get_distinct("composer") == {"Johann Sebastian Bach"}
+    assert index.get_distinct("genre") == set()
+
+
+def test_observer_leaves_the_writes_to_the_writer():
+    client = qobuz_client.Client("123", "abc", session=mock.Mock(headers={}))
+    index = search_index.SearchIndex()
+    client.entities.subscribe(index.observe)
+    flushed = threading.Event()
+    threads = []
+
+    def flush():
+        threads.append(threading.current_thread())
+        flushed.set()
+
+    with mock.patch.object(index, "_flush", side_effect=flush):
+        for id in range(search_index._FLUSH_SIZE):
+            qobuz_client.Artist.from_data(client, {"id": id, "name": f"Artist {id}"})
+
+        assert flushed.wait(timeout=5)
+    assert threads == [index._writer]
+    index.close()
+
+
+def test_oldest_entries_are_pruned():
+    client = qobuz_client.Client("123", "abc", session=mock.Mock(headers={}))
+    index = search_index.SearchIndex(max_entries=10)
+    client.entities.subscribe(index.observe)
+    for id in range(12):
+        qobuz_client.Artist.from_data(client, {"id": id, "name": f"Artist {id}"})
+        index.flush()
+
+    names = {artist.name for artist in index.search({"artist": ["artist"]})["artist"]}
+    assert names == {f"Artist {id}" for id in range(2, 12)}
+    index.close()
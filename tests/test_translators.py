@@ -0,0 +1,52 @@
+from unittest import mock
+
+from mopidy_qobuz import client as qobuz_client
+from mopidy_qobuz import translators
+
+_ARTIST = {"id": 1, "name": "Kanye West"}
+_ALBUM = {"id": "foo", "title": "Yeezus", "artist": _ARTIST, "streamable": True}
+
+
+def test_tracks_share_album_models():
+    client = qobuz_client.Client("123", "abc", session=mock.Mock(headers={}))
+    tracks = [
+        qobuz_client.Track.from_data(
+            client,
+            {"id": id, "album": _ALBUM, "performer": _ARTIST, "streamable": True},
+        )
+        for id in range(3)
+    ]
+    models = [translators.to_track(track) for track in tracks]
+
+    assert all(model.album is models[0].album for model in models)
+    assert models[0].album.num_tracks == 1
+
+    # A merged payload gives a new model
+    qobuz_client.Album.from_data(client, dict(_ALBUM, tracks_count=3))
+    assert translators.to_album(tracks[0].album).num_tracks == 3
+
+
+def test_raw_tracks_translate_like_entities():
+    client = qobuz_client.Client("123", "abc", session=mock.Mock(headers={}))
+    album = dict(_ALBUM, id="bar", version="Deluxe", release_type="Remix")
+    items = [
+        {"id": 1, "title": "A", "version": "Album Version", "streamable": True},
+        {"id": 2, "title": "B", "version": "Live", "streamable": True},
+        {"id": 3, "title": "C", "version": "Remix", "streamable": True},
+        {"id": 4, "title": "D (Live)", "version": "Live", "streamable": True},
+        {"id": 5, "title": "E", "streamable": False},
+        {"id": 6, "title": "F", "performer": {"id": 2}, "streamable": True},
+    ]
+    payloads = [dict(item, album=album) for item in items]
+
+    expected = [
+        translators.to_track(qobuz_client.Track.from_data(client, payload))
+        for payload in payloads
+    ]
+    expected = [track for track in expected if track is not None]
+
+    assert translators.to_tracks(payloads) == expected
+    assert translators.to_tracks(items, album=album) == expected
+    assert [track.name for track in expected] == ["A", "B (Live)", "C", "D (Live)", "F"]
+    # Tracks of an album without artist are left out, as to_track can't build it
+    assert translators.to_tracks(items, album={"id": "baz"}) == []
@@ -0,0 +1,104 @@
+from unittest import mock
+
+import pytest
+import requests
+
+from mopidy_qobuz.client import transport as transport_lib
+
+
+@pytest.fixture(autouse=True)
+def sleep():
+    with mock.patch.object(transport_lib.time, "sleep") as sleep:
+        yield sleep
+
+
+def _transport(*responses, **kwargs):
+    session = mock.Mock()
+    session.get.side_effect = responses
+    session.post.side_effect = responses
+    return transport_lib.Transport(session, **kwargs)
+
+
+def _response(status_code, headers=None):
+    return mock.Mock(status_code=status_code, headers=headers or {})
+
+
+def test_timeouts_are_set():
+    transport = _transport(_response(200))
+    transport.get("https://foo", params={"a": 1})
+
+    transport.session.get.assert_called_once_with(
+        "https://foo",
+        params={"a": 1},
+        timeout=(transport_lib.CONNECT_TIMEOUT, transport_lib.READ_TIMEOUT),
+    )
+
+
+def test_retryable_errors_are_tried_again(sleep):
+    transport = _transport(
+        requests.ConnectionError(), _response(503, {"Retry-After": "3"}), _response(200)
+    )
+
+    assert transport.get("https://foo").status_code == 200
+    assert transport.session.get.call_count == 3
+    assert 0 <= sleep.call_args_list[0].args[0] <= transport.backoff
+    assert sleep.call_args_list[1].args[0] == 3
+
+
+def test_other_errors_are_not_tried_again():
+    transport = _transport(_response(404), _response(200))
+    assert transport.get("https://foo").status_code == 404
+
+    transport = _transport(_response(503), _response(200))
+    assert transport.post("https://foo").status_code == 503
+
+    transport = _transport(*[requests.Timeout()] * 3)
+    with pytest.raises(requests.Timeout):
+        transport.get("https://foo")
+    assert transport.session.get.call_count == 3
+
+
+def test_circuit_breaker():
+    transport = _transport(
+        *[_response(500)] * 3 + [_response(200)] * 2,
+        retries=0,
+        failure_threshold=3,
+        reset_timeout=60,
+    )
+    for _ in range(3):
+        assert transport.get("https://foo").status_code == 500
+
+    with pytest.raises(transport_lib.CircuitOpenError):
+        transport.get("https://foo")
+    assert transport.session.get.call_count == 3
+
+    # A trial request closes it again once the API is back
+    transport.reset_timeout = 0
+    assert transport.get("https://foo").status_code == 200
+    assert transport.get("https://foo").status_code == 200
+
+
+def test_failed_trial_reopens_the_circuit():
+    transport = _transport(
+        _response(500),
+        requests.exceptions.ChunkedEncodingError(),
+        _response(200),
+        retries=0,
+        failure_threshold=1,
+        reset_timeout=0,
+    )
+    assert transport.get("https://foo").status_code == 500
+
+    # Not retried, but the trial is over: the next one is let through
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        transport.get("https://foo")
+    assert transport.get("https://foo").status_code == 200
+
+
+def test_circuit_breaker_disabled():
+    transport = _transport(
+        *[_response(500)] * 3, _response(200), retries=0, failure_threshold=None
+    )
+    for _ in range(3):
+        assert transport.get("https://foo").status_code == 500
+    assert transport.get("https://foo").status_code == 200